@@ -8,10 +8,11 @@ This module defines the abstract base class for feature selection algorithms.
 """
 
 import abc
-from typing import NoReturn, Tuple
+from typing import NoReturn, Tuple, Union
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 
 class _BaseSelector(metaclass=abc.ABCMeta):
@@ -35,18 +36,33 @@ class _BaseSelector(metaclass=abc.ABCMeta):
         # Importance/score for each feature
         self.abs_scores = None
 
+        # Additional statistics of the fit, if any, such as approximation quality or convergence
+        self.diagnostics = None
+
     @abc.abstractmethod
     def transform(self, data: pd.DataFrame) -> pd.DataFrame:
         """Abstract method
         Returns the transformed data.
         """
 
+    def merge(self, other: '_BaseSelector') -> NoReturn:
+        """
+        Combines the statistics accumulated by partial_fit of another selector over different rows.
+        """
+        raise NotImplementedError(type(self).__name__ + " does not support merge.")
+
+    def finalize(self) -> NoReturn:
+        """
+        Completes the fit from the statistics accumulated by partial_fit, if any.
+        """
+
     def set_num_features(self, data):
         # Int vs. float number of features
         if isinstance(self.num_features, float):
-            self.num_features = int(len(data.columns) * self.num_features)
+            self.num_features = int(data.shape[1] * self.num_features)
 
-    def get_top_k(self, data: pd.DataFrame, scores: np.ndarray) -> pd.DataFrame:
+    def get_top_k(self, data: Union[pd.DataFrame, sparse.spmatrix], scores: np.ndarray) \
+            -> Union[pd.DataFrame, sparse.spmatrix]:
 
         # When num_feature is float, set the size with ratio from data
         self.set_num_features(data)
@@ -57,6 +73,10 @@ class _BaseSelector(metaclass=abc.ABCMeta):
         # Sort by min index first to keep the order in the original data
         ind_min_first = sorted(ind)
 
+        # Return sparse matrix with reduced columns, without densifying
+        if sparse.issparse(data):
+            return data[:, ind_min_first]
+
         # Return dataframe with reduced columns
         return data[data.columns[ind_min_first]].copy()
 
@@ -71,6 +91,12 @@ class _BaseSupervisedSelector(_BaseSelector, metaclass=abc.ABCMeta):
         Fits the selector to the given data.
         """
 
+    def partial_fit(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
+        """
+        Updates the selector with a chunk of the data.
+        """
+        raise NotImplementedError(type(self).__name__ + " does not support partial fit.")
+
     def fit_transform(self, data: pd.DataFrame, labels: pd.Series) -> pd.DataFrame:
         """Fits the selector to the given and returns the transformed data.
         """
@@ -88,6 +114,12 @@ class _BaseUnsupervisedSelector(_BaseSelector, metaclass=abc.ABCMeta):
         Fits the selector to the given data.
         """
 
+    def partial_fit(self, data: pd.DataFrame) -> NoReturn:
+        """
+        Updates the selector with a chunk of the data.
+        """
+        raise NotImplementedError(type(self).__name__ + " does not support partial fit.")
+
     def fit_transform(self, data: pd.DataFrame) -> pd.DataFrame:
         """Fits the selector to the given and returns the transformed data.
         """
@@ -2,15 +2,29 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+from typing import Iterator, NoReturn, Tuple
+
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
+from scipy import sparse
+from scipy.stats import rankdata
 
 from feature.base import _BaseUnsupervisedSelector
+from feature.utils import _RunningMoments, check_true
+
+# Maximum number of hash tables and number of sampled columns in approximate mode
+_MAX_TABLES = 256
+_NUM_SAMPLED = 256
+
+# Maximum number of rows with float32 ranks, the half-integer average ranks of ties are exact up to it
+_MAX_FLOAT32_RANKS = 2 ** 22
 
 
 class _Correlation(_BaseUnsupervisedSelector):
 
-    def __init__(self, seed: int, threshold: float, method: str):
+    def __init__(self, seed: int, threshold: float, method: str, block_size: int, dtype: str, n_jobs: int,
+                 approximate: bool, recall: float):
         super().__init__(seed)
 
         # Track columns that meet correlation threshold
@@ -19,26 +33,531 @@ class _Correlation(_BaseUnsupervisedSelector):
         # Correlation method
         self.method = method
 
-        # Create correlation matrix
-        self.corr_matrix = None
+        # Number of columns per block and floating point precision of the blocked engine
+        self.block_size = block_size
+        self.dtype = dtype
+
+        # Number of concurrent threads for rank correlations
+        self.n_jobs = n_jobs
+
+        # Approximate screening of correlated pairs and its target recall
+        self.approximate = approximate
+        self.recall = recall
+
+        # Feature names and the sparse graph of pairs with correlation greater than threshold
+        # Stored as upper triangular adjacency, i.e., an edge goes from the smaller to the larger index
+        self.columns = None
+        self.graph = None
+
+        # Count, means and cross-products of the chunks seen by partial fit
+        self.moments = None
+
+    def fit(self, data: pd.DataFrame) -> NoReturn:
 
-    def fit(self, data: pd.DataFrame):
+        # Fit from scratch discards statistics of partial fit
+        self.moments = None
 
-        # Find absolute Pearson correlation between pairs of features
-        self.corr_matrix = data.corr(method=self.method).abs()
+        if self.approximate:
+            check_true(_is_dense_numeric(data),
+                       ValueError("Approximate correlation requires numeric data without missing values."))
+
+            # Spearman is the Pearson correlation of ranks
+            values = data.values if self.method == "pearson" else _rank_columns(data.values, self.block_size)
+
+            # Find candidate pairs with hashing and verify them with exact correlation
+            self.abs_scores, self.graph, self.diagnostics = _approximate_reduce(values, self.threshold, self.recall,
+                                                                                self.block_size, self.dtype,
+                                                                                self.seed)
+            self.columns = data.columns
+            return
+
+        if self.method == "pearson" and _is_dense_numeric(data):
+            # Find absolute Pearson correlation in blocks without creating the full matrix
+            columns = data.columns
+            tiles = _pearson_tiles(data.values, self.block_size, self.dtype)
+        elif self.method == "pearson" and _is_numeric(data):
+            # Pairwise complete Pearson correlation with masked matrix multiplications
+            columns = data.columns
+            tiles = _pairwise_pearson_tiles(data.values, self.block_size)
+        elif self.method == "spearman" and _is_dense_numeric(data):
+            # Spearman is the Pearson correlation of ranks, rank each column once
+            columns = data.columns
+            tiles = _pearson_tiles(_rank_columns(data.values, self.block_size), self.block_size, self.dtype)
+        elif self.method == "kendall" and _is_dense_numeric(data):
+            # Find Kendall Tau in blocks with merge sort
+            columns = data.columns
+            tiles = _kendall_tiles(data.values, self.block_size, self.n_jobs)
+        else:
+            # Pairwise correlation matrix handles missing values and rank methods
+            corr_matrix = data.corr(method=self.method)
+            columns = corr_matrix.columns
+            tiles = _matrix_tiles(corr_matrix.values, self.block_size)
 
         # Set absolute importance as mean correlation
-        # Convert from series to numpy
-        self.abs_scores = self.corr_matrix.mean(0).values
+        # Keep only the highly correlated pairs
+        self.abs_scores, self.graph = _reduce_tiles(tiles, len(columns), self.threshold)
+        self.columns = columns
 
-    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+    def partial_fit(self, data: pd.DataFrame) -> NoReturn:
+
+        # Pearson correlation only needs sufficient statistics, unlike ranks
+        check_true(self.method == "pearson" and not self.approximate,
+                   ValueError("Partial fit is only supported for exact pearson correlation."))
+        check_true(_is_dense_numeric(data), ValueError("Partial fit requires numeric data without missing values."))
+
+        if self.moments is None:
+            self.moments = _RunningMoments()
+            self.columns = data.columns
+        else:
+            check_true(list(data.columns) == list(self.columns),
+                       ValueError("Columns of each chunk must be the same as the first chunk."))
+
+        # Accumulate statistics, scores and graph are found on demand
+        self.moments.update(data.values)
+        self.abs_scores, self.graph = None, None
 
-        # Select upper triangle of correlation matrix
-        # Diagonals and the rest becomes NaN
-        upper = self.corr_matrix.where(np.triu(np.ones(self.corr_matrix.shape), k=1).astype(bool))
+    def merge(self, other: '_Correlation') -> NoReturn:
 
-        # Find features to drop with any correlation greater than threshold
-        to_drop = [column for column in upper.columns if any(upper[column] > self.threshold)]
+        # Combine statistics of another shard of rows
+        check_true(self.moments is not None and other.moments is not None,
+                   ValueError("Only selectors fit with partial fit can be merged."))
+        check_true(list(other.columns) == list(self.columns),
+                   ValueError("Columns of merged selectors must be the same."))
+        self.moments.merge(other.moments)
+        self.abs_scores, self.graph = None, None
+
+    def finalize(self) -> NoReturn:
+
+        # Nothing to do after fit or once statistics are finalized
+        if self.moments is None or self.graph is not None:
+            return
+
+        tiles = _matrix_tiles(self.moments.correlation(), self.block_size)
+        self.abs_scores, self.graph = _reduce_tiles(tiles, len(self.columns), self.threshold)
+
+    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+
+        # Given a pair of highly correlated features, the one with smaller index is kept
+        # Drop features with any incoming edge from a smaller index
+        is_correlated = self.graph.getnnz(axis=0) > 0
 
         # Drop features
-        return data.drop(to_drop, axis=1)
+        return data.drop(self.columns[is_correlated], axis=1)
+
+    def get_max_correlation(self) -> pd.Series:
+
+        # Largest absolute correlation of each feature with a feature of smaller index
+        # Zero when none is greater than the fitted threshold
+        # A feature is dropped at any threshold, above the fitted one, smaller than this value
+        return pd.Series(self.graph.max(axis=0).toarray().ravel(), index=self.columns)
+
+
+def _is_numeric(data: pd.DataFrame) -> bool:
+    """
+    Returns whether all columns are numeric.
+    """
+    return all(np.issubdtype(dtype, np.number) for dtype in data.dtypes)
+
+
+def _is_dense_numeric(data: pd.DataFrame) -> bool:
+    """
+    Returns whether all columns are numeric without missing values.
+    """
+    return _is_numeric(data) and not data.isnull().values.any()
+
+
+def _standardize(values: np.ndarray, block_size: int, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the columns centered and scaled to unit norm, and whether each column is constant.
+
+    The correlation of two standardized columns is their dot product.
+    Columns are processed one block at a time to bound the float64 copies.
+    """
+
+    num_columns = values.shape[1]
+    standardized = np.empty(values.shape, dtype=dtype)
+    is_constant = np.zeros(num_columns, dtype=bool)
+
+    for start in range(0, num_columns, block_size):
+        end = min(start + block_size, num_columns)
+        centered = values[:, start:end].astype(np.float64)
+        centered -= centered.mean(axis=0)
+        norms = np.sqrt(np.square(centered).sum(axis=0))
+
+        # Correlation with a constant column is undefined
+        is_constant[start:end] = norms == 0
+        norms[norms == 0] = 1
+        standardized[:, start:end] = centered / norms
+
+    return standardized, is_constant
+
+
+def _pearson_tiles(values: np.ndarray, block_size: int, dtype: str) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Yields blocks of the Pearson correlation matrix without creating the full matrix.
+
+    Columns are standardized once such that the correlation of two columns is their dot product.
+    Each block holds the correlation of columns [0, end) against columns [start, end).
+    """
+
+    standardized, is_constant = _standardize(values, block_size, dtype)
+
+    for start in range(0, values.shape[1], block_size):
+        end = min(start + block_size, values.shape[1])
+
+        # Matrix multiplication of standardized columns gives correlations
+        tile = standardized[:, :end].T @ standardized[:, start:end]
+        tile[is_constant[:end], :] = np.nan
+        tile[:, is_constant[start:end]] = np.nan
+
+        yield start, end, tile
+
+
+def _pairwise_pearson_tiles(values: np.ndarray, block_size: int) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Yields blocks of the pairwise complete Pearson correlation matrix, as in pandas corr with missing values.
+
+    Each pair of columns uses only the rows where both are observed.
+    With the mask of observed values and the values filled with zero,
+    the pairwise counts, sums, sums of squares and cross-products are matrix multiplications.
+    Columns are centered on their observed mean first, which keeps the sums small and the result accurate.
+    """
+
+    observed = ~np.isnan(values)
+    mask = observed.astype(np.float64)
+    means = np.nansum(values, axis=0) / np.maximum(mask.sum(axis=0), 1)
+    filled = np.where(observed, values - means, 0)
+    squared = np.square(filled)
+
+    for start in range(0, values.shape[1], block_size):
+        end = min(start + block_size, values.shape[1])
+
+        # Rows are columns [0, end), statistics over rows where the column of the block is observed as well
+        count = mask[:, :end].T @ mask[:, start:end]
+        row_sum = filled[:, :end].T @ mask[:, start:end]
+        col_sum = mask[:, :end].T @ filled[:, start:end]
+        row_square = squared[:, :end].T @ mask[:, start:end]
+        col_square = mask[:, :end].T @ squared[:, start:end]
+        cross = filled[:, :end].T @ filled[:, start:end]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = cross - row_sum * col_sum / count
+            row_variance = row_square - np.square(row_sum) / count
+            col_variance = col_square - np.square(col_sum) / count
+
+            # Undefined for less than two rows or constant columns, up to rounding errors
+            is_undefined = (row_variance <= 1e-12 * row_square) | (col_variance <= 1e-12 * col_square)
+            tile = np.clip(covariance / np.sqrt(row_variance * col_variance), -1, 1)
+        tile[is_undefined | (count < 2)] = np.nan
+
+        yield start, end, tile
+
+
+def _rank_columns(values: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    Returns the rank of each value within its column, ties get their average rank.
+
+    Ranks are stored as float32 up to 2^22 rows, which is exact for the half-integer average ranks of ties,
+    and as float64 for more rows.
+    """
+    ranks = np.empty(values.shape, dtype=np.float32 if values.shape[0] <= _MAX_FLOAT32_RANKS else np.float64)
+    for start in range(0, values.shape[1], block_size):
+        end = min(start + block_size, values.shape[1])
+        ranks[:, start:end] = rankdata(values[:, start:end], axis=0)
+    return ranks
+
+
+def _kendall_tiles(values: np.ndarray, block_size: int, n_jobs: int) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Yields blocks of the Kendall Tau-b matrix in the same layout as _pearson_tiles.
+
+    Each column of a block is paired with the columns of smaller index, and the rest is filled by symmetry.
+    Partners are processed in chunks with bounded memory, and the chunks run in parallel threads.
+    """
+
+    # Dense integer ranks computed once, one row per feature
+    num_rows, num_columns = values.shape
+    ranks = np.empty((num_columns, num_rows), dtype=np.int32)
+    for i in range(num_columns):
+        ranks[i] = np.unique(values[:, i], return_inverse=True)[1].ravel()
+
+    # Number of tied pairs within each feature
+    tied_pairs = _count_tied_pairs(np.sort(ranks, axis=1))
+
+    # Number of partners processed together, about 4M ranks
+    chunk_size = max(1, 2 ** 22 // max(num_rows, 1))
+
+    for start in range(0, num_columns, block_size):
+        end = min(start + block_size, num_columns)
+
+        pair_blocks = [(anchor, chunk, min(chunk + chunk_size, anchor))
+                       for anchor in range(start, end) for chunk in range(0, anchor, chunk_size)]
+        results = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_kendall_tau)(ranks[anchor], ranks[chunk:chunk_end], tied_pairs[anchor], tied_pairs[chunk:chunk_end])
+            for anchor, chunk, chunk_end in pair_blocks)
+
+        # Correlation of a feature with itself is one, as in pandas
+        tile = np.empty((end, end - start))
+        tile[start:end] = np.eye(end - start)
+        for (anchor, chunk, chunk_end), tau in zip(pair_blocks, results):
+            tile[chunk:chunk_end, anchor - start] = tau
+            if chunk_end > start:
+                tile[anchor, max(chunk, start) - start:chunk_end - start] = tau[max(chunk, start) - chunk:]
+
+        yield start, end, tile
+
+
+def _count_tied_pairs(sorted_values: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of tied pairs in each row of a row-wise sorted matrix.
+
+    Each element counts the equal elements before it within its run, which sums to t * (t - 1) / 2 per run.
+    """
+    index = np.arange(sorted_values.shape[-1])
+    is_run_start = np.ones(sorted_values.shape, dtype=bool)
+    is_run_start[..., 1:] = sorted_values[..., 1:] != sorted_values[..., :-1]
+    run_start = np.maximum.accumulate(np.where(is_run_start, index, 0), axis=-1)
+    return (index - run_start).sum(axis=-1, dtype=np.int64)
+
+
+def _kendall_tau(x: np.ndarray, y: np.ndarray, x_tied_pairs: int, y_tied_pairs: np.ndarray) -> np.ndarray:
+    """
+    Returns the Kendall Tau-b between x and each row of y using Knight's algorithm.
+
+    Rows are ordered by x, breaking ties of x with y, once for all partners.
+    The discordant pairs are then the inversions in y, counted with merge sort in O(n log n).
+    Inputs are dense integer ranks.
+    """
+
+    num_rows = len(x)
+    total_pairs = num_rows * (num_rows - 1) // 2
+
+    # Order by x
+    order = np.argsort(x, kind="stable")
+    y = y[:, order]
+
+    # Pairs tied in x are not discordant, sort y within the groups of tied x
+    if x_tied_pairs > 0:
+        keys = np.sort(x[order].astype(np.int64) * (num_rows + 1) + y, axis=1)
+        joint_tied_pairs = _count_tied_pairs(keys)
+        y = (keys % (num_rows + 1)).astype(np.int32)
+    else:
+        joint_tied_pairs = 0
+
+    discordant = _count_inversions(y)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        numerator = total_pairs - x_tied_pairs - y_tied_pairs + joint_tied_pairs - 2 * discordant
+        return numerator / np.sqrt((total_pairs - x_tied_pairs) * (total_pairs - y_tied_pairs).astype(float))
+
+
+def _count_inversions(y: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of inversions in each row using bottom-up merge sort for all rows at once.
+
+    Rows are split into 2^k blocks of 16 to 31 elements where inversions are counted directly.
+    Sorted runs are then merged pairwise. Each element carries its run in the lowest bit.
+    After sorting a pair of runs of width w, the elements of the second run are placed at positions
+    that sum to w * (w - 1) / 2 plus the number of elements of the first run placed before them,
+    while each of them is inverted with the elements of the first run placed after it.
+    Rows are padded at the end with a value greater than all ranks, which adds no inversions.
+    """
+
+    num_partners, num_rows = y.shape
+    num_levels = max(0, (num_rows // 16).bit_length() - 1)
+    width = -(-num_rows // 2 ** num_levels)
+
+    padded = np.full((num_partners, width * 2 ** num_levels), num_rows, dtype=np.int32)
+    padded[:, :num_rows] = y
+    blocks = padded.reshape(num_partners, -1, width)
+
+    # Count inversions within blocks directly
+    inversions = np.zeros(num_partners, dtype=np.int64)
+    for i in range(width - 1):
+        inversions += (blocks[..., i:i + 1] > blocks[..., i + 1:]).sum(axis=(1, 2), dtype=np.int64)
+    runs = np.sort(blocks, axis=-1)
+
+    # Merge pairs of sorted runs
+    for _ in range(num_levels):
+        keys = (runs.reshape(num_partners, -1, 2 * width) << 1) | np.repeat(np.array([0, 1], dtype=np.int32), width)
+        keys.sort(axis=-1)
+        position_sum = ((keys & 1).astype(float) @ np.arange(2 * width, dtype=float)).sum(axis=1).astype(np.int64)
+        inversions += keys.shape[1] * (width * width + width * (width - 1) // 2) - position_sum
+        runs = keys >> 1
+        width *= 2
+
+    return inversions
+
+
+def _matrix_tiles(corr_matrix: np.ndarray, block_size: int) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Yields blocks of an existing correlation matrix in the same layout as _pearson_tiles.
+    """
+    for start in range(0, corr_matrix.shape[1], block_size):
+        end = min(start + block_size, corr_matrix.shape[1])
+        yield start, end, corr_matrix[:end, start:end]
+
+
+def _reduce_tiles(tiles: Iterator[Tuple[int, int, np.ndarray]], num_columns: int, threshold: float) \
+        -> Tuple[np.ndarray, sparse.csr_matrix]:
+    """
+    Returns the mean absolute correlation of each column
+    and the upper triangular graph of absolute correlations greater than threshold.
+
+    Missing correlations are skipped as in pandas mean.
+    """
+
+    abs_sum = np.zeros(num_columns)
+    abs_count = np.zeros(num_columns)
+    rows, cols, values = [], [], []
+
+    for start, end, tile in tiles:
+        tile = np.abs(tile)
+        is_valid = ~np.isnan(tile)
+
+        # Columns of the block against all columns up to the end of the block
+        abs_sum[start:end] += np.nansum(tile, axis=0, dtype=np.float64)
+        abs_count[start:end] += is_valid.sum(axis=0)
+
+        # Columns before the block against the block, by symmetry
+        abs_sum[:start] += np.nansum(tile[:start], axis=1, dtype=np.float64)
+        abs_count[:start] += is_valid[:start].sum(axis=1)
+
+        # Upper triangle only, i.e., correlation with a column of smaller index
+        is_above = tile > threshold
+        is_above[start:end] = np.triu(is_above[start:end], k=1)
+        row, col = np.nonzero(is_above)
+        rows.append(row)
+        cols.append(col + start)
+        values.append(tile[row, col])
+
+    with np.errstate(invalid="ignore"):
+        abs_scores = abs_sum / abs_count
+
+    # Edges are collected block by block, O(number of correlated pairs) memory
+    # At low thresholds nearly every pair is an edge and the graph is larger than the dense upper triangle
+    graph = sparse.csr_matrix((np.concatenate(values + [np.empty(0)]),
+                               (np.concatenate(rows + [np.empty(0, dtype=int)]),
+                                np.concatenate(cols + [np.empty(0, dtype=int)]))),
+                              shape=(num_columns, num_columns))
+
+    return abs_scores, graph
+
+
+def _approximate_reduce(values: np.ndarray, threshold: float, recall: float, block_size: int, dtype: str,
+                        seed: int) -> Tuple[np.ndarray, sparse.csr_matrix, dict]:
+    """
+    Returns the estimated mean absolute correlation of each column,
+    the upper triangular graph of absolute correlations greater than threshold found among candidate pairs,
+    and statistics on the quality of the approximation.
+
+    Candidates are proposed with locality sensitive hashing of the standardized columns.
+    The signs of a random projection agree for two columns with probability 1 - arccos(r) / pi.
+    Columns with the same signs on all projections of a hash table become candidates.
+    Signs are folded such that negatively correlated columns collide as well.
+    A pair is missed only if it collides in none of the tables.
+
+    Mean absolute correlation is estimated against a random sample of columns.
+    The exact correlations of the sample also estimate the recall of the candidates.
+    """
+
+    rng = np.random.default_rng(seed)
+    standardized, is_constant = _standardize(values, block_size, dtype)
+    num_rows, num_columns = standardized.shape
+
+    # Columns are hashed and verified one at a time, stored contiguously
+    standardized = np.ascontiguousarray(standardized.T)
+
+    # About num_columns random collisions per table, and enough tables to reach the target recall
+    num_bits = int(min(62, max(1, np.ceil(np.log2(max(num_columns, 2))))))
+    threshold_agreement = 1 - np.arccos(min(threshold, 1)) / np.pi
+    threshold_collision = threshold_agreement ** num_bits + (1 - threshold_agreement) ** num_bits
+    with np.errstate(divide="ignore"):
+        num_tables = np.log(1 - recall) / np.log1p(-threshold_collision)
+    num_tables = int(min(_MAX_TABLES, max(1, np.ceil(num_tables))))
+
+    # Codes of all tables from a single projection per block of columns
+    projection = rng.standard_normal((num_rows, num_tables * num_bits)).astype(dtype)
+    bit_values = 1 << np.arange(num_bits, dtype=np.int64)
+    codes = np.empty((num_columns, num_tables), dtype=np.int64)
+    for start in range(0, num_columns, block_size):
+        signs = (standardized[start:start + block_size] @ projection) > 0
+        codes[start:start + block_size] = signs.reshape(-1, num_tables, num_bits) @ bit_values
+    codes = np.minimum(codes, codes ^ (2 ** num_bits - 1))
+
+    # Constant columns do not collide
+    codes[is_constant] = -1 - np.arange(is_constant.sum())[:, np.newaxis]
+
+    # Candidate pairs, encoded as smaller index * num_columns + larger index
+    candidates = np.unique(np.concatenate([_bucket_pairs(codes[:, table]) for table in range(num_tables)]))
+
+    # Verify candidates with exact correlation
+    rows, cols = np.divmod(candidates, num_columns)
+    corr = np.empty(len(candidates))
+    chunk_size = max(1, 2 ** 24 // max(num_rows, 1))
+    for start in range(0, len(candidates), chunk_size):
+        end = start + chunk_size
+        corr[start:end] = np.einsum("ij,ij->i", standardized[rows[start:end]], standardized[cols[start:end]])
+    is_above = np.abs(corr) > threshold
+
+    # Exact correlation against a random sample of columns
+    sample = np.sort(rng.choice(num_columns, size=min(num_columns, _NUM_SAMPLED), replace=False))
+    abs_scores = np.empty(num_columns)
+    sample_keys, sample_values = [], []
+    for start in range(0, num_columns, block_size):
+        end = min(start + block_size, num_columns)
+        tile = np.abs(standardized[start:end] @ standardized[sample].T)
+        tile[is_constant[start:end], :] = np.nan
+        tile[:, is_constant[sample]] = np.nan
+
+        # Mean absolute correlation, skipping missing as in pandas mean
+        with np.errstate(invalid="ignore"):
+            abs_scores[start:end] = np.nansum(tile, axis=1, dtype=np.float64) / (~np.isnan(tile)).sum(axis=1)
+
+        # Highly correlated pairs in the sample
+        row, col = np.nonzero(tile > threshold)
+        value = tile[row, col]
+        row, col = row + start, sample[col]
+        is_pair = row != col
+        sample_keys.append(np.minimum(row, col)[is_pair] * num_columns + np.maximum(row, col)[is_pair])
+        sample_values.append(value[is_pair])
+    sample_keys, index = np.unique(np.concatenate(sample_keys), return_index=True)
+    sample_values = np.concatenate(sample_values)[index]
+
+    # Highly correlated pairs from both verified candidates and the sample
+    keys, index = np.unique(np.concatenate([candidates[is_above], sample_keys]), return_index=True)
+    graph_values = np.concatenate([np.abs(corr[is_above]), sample_values])[index]
+    graph = sparse.csr_matrix((graph_values, np.divmod(keys, num_columns)), shape=(num_columns, num_columns))
+
+    with np.errstate(invalid="ignore"):
+        diagnostics = {"num_bits": num_bits,
+                       "num_tables": num_tables,
+                       "num_pairs": num_columns * (num_columns - 1) // 2,
+                       "num_candidates": len(candidates),
+                       "num_correlated": len(keys),
+                       "precision": is_above.sum() / len(candidates),
+                       "recall": np.isin(sample_keys, candidates).sum() / len(sample_keys),
+                       "recall_at_threshold": 1 - (1 - threshold_collision) ** num_tables}
+
+    return abs_scores, graph, diagnostics
+
+
+def _bucket_pairs(codes: np.ndarray) -> np.ndarray:
+    """
+    Returns all pairs of indexes with the same code, encoded as smaller index * len(codes) + larger index.
+    """
+
+    num_codes = len(codes)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+
+    # Each position is paired with the following positions of its bucket
+    index = np.arange(num_codes)
+    is_end = np.append(sorted_codes[1:] != sorted_codes[:-1], True)
+    bucket_end = np.minimum.accumulate(np.where(is_end, index, num_codes)[::-1])[::-1]
+    counts = bucket_end - index
+    first = np.repeat(index, counts)
+    second = first + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    first, second = order[first], order[second]
+    return np.minimum(first, second) * num_codes + np.maximum(first, second)
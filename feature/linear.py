@@ -2,39 +2,88 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-from typing import NoReturn, Tuple
+from typing import List, NoReturn, Tuple, Union
 
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression, Lasso, Ridge
-from sklearn.linear_model import LogisticRegression, RidgeClassifier
+from scipy import linalg, sparse
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression, Lasso, Ridge, lasso_path
+from sklearn.linear_model import LogisticRegression, RidgeClassifier, SGDClassifier, SGDRegressor
+from sklearn.metrics import log_loss
+from sklearn.preprocessing import LabelBinarizer
+from sklearn.svm import l1_min_c
 
 from feature.base import _BaseSupervisedSelector, _BaseDispatcher
-from feature.utils import Num, get_task_string
+from feature.utils import _RunningVariance, Num, check_true, get_task_string
+
+# Number of alphas and ratio of the smallest to the largest alpha of the regularization path, same as sklearn
+_PATH_NUM_ALPHAS = 100
+_PATH_EPS = 1e-3
+
+# Maximum number of saga epochs of each alpha in the l1 logistic path, unscaled data converges slowly
+_PATH_MAX_ITER = 1000
+
+# Number of values per chunk of rows, maximum number of epochs and tolerance of loss in sgd fit
+_CHUNK_SIZE = 2 ** 22
+_SGD_MAX_EPOCHS = 20
+_SGD_TOL = 1e-3
 
 
 class _Linear(_BaseSupervisedSelector, _BaseDispatcher):
 
-    def __init__(self, seed: int, num_features: Num, regularization: str, alpha:Num):
+    def __init__(self, seed: int, num_features: Num, regularization: str, alpha: Union[Num, str],
+                 solver: str = "exact"):
         super().__init__(seed)
 
         self.num_features = num_features  # this could be int or float
         self.regularization = regularization
         self.alpha = alpha
+        self.solver = solver
 
         # Implementor is decided when data becomes available in fit()
         self.imp = None
 
+        # Regularization path is searched in fit, starting from the largest alpha
+        self.is_path = alpha == "path"
+
         # Implementor factory
         self.factory = {"regression_none": LinearRegression(),
-                        "regression_lasso": Lasso(random_state=self.seed),
+                        "regression_lasso": Lasso(random_state=self.seed, warm_start=self.is_path),
                         "regression_ridge": Ridge(random_state=self.seed),
                         # "classification_none": LogisticRegression(penalty="none"), # won't converge most times
                         "classification_none": LogisticRegression(random_state=self.seed,
                                                                   multi_class="auto", solver="liblinear"),
+                        # Path warm starts l1 logistic with saga, liblinear cannot warm start from the previous C
                         "classification_lasso": LogisticRegression(random_state=self.seed, penalty='l1',
-                                                                   multi_class="auto", solver="liblinear"),
+                                                                   multi_class="auto",
+                                                                   solver="saga" if self.is_path else "liblinear",
+                                                                   warm_start=self.is_path,
+                                                                   max_iter=_PATH_MAX_ITER if self.is_path else 100),
                         "classification_ridge": RidgeClassifier(random_state=self.seed)}
 
+        # Stochastic gradient descent, with averaged coefficients, over standardized chunks of rows
+        if solver == "sgd":
+            penalty = {"none": None, "lasso": "l1", "ridge": "l2"}[regularization]
+            # Without penalty, alpha only sets the optimal learning rate of classification, as sklearn default
+            alpha = alpha if penalty is not None else 1e-4
+            self.factory = {"regression_" + regularization:
+                                SGDRegressor(loss="squared_error", penalty=penalty, alpha=alpha,
+                                             average=True, random_state=self.seed),
+                            "classification_" + regularization:
+                                SGDClassifier(loss="log_loss", penalty=penalty, alpha=alpha,
+                                              average=True, random_state=self.seed)}
+
+        # Running statistics of features and regression labels for standardization,
+        # classes of the labels and the progress of each update of sgd
+        self.moments = None
+        self.label_moments = None
+        self.classes = None
+        self.losses = None
+        self.changes = None
+        self.num_epochs = None
+        self.is_converged = None
+
     def get_model_args(self, selection_method) -> Tuple:
 
         # Pack model argument
@@ -48,7 +97,17 @@ class _Linear(_BaseSupervisedSelector, _BaseDispatcher):
         # Set linear model
         self.imp = self.factory.get(get_task_string(labels) + regularization)
 
-    def fit(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
+    def fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # Fit linear models along the regularization path until num_features are selected
+        if self.is_path:
+            self._fit_path(data, labels)
+            return
+
+        # Fit sgd with passes over shuffled chunks of rows until the loss stops improving
+        if self.solver == "sgd":
+            self._fit_sgd(data, labels)
+            return
 
         # Fit linear model
         self.imp.fit(X=data, y=labels)
@@ -68,7 +127,263 @@ class _Linear(_BaseSupervisedSelector, _BaseDispatcher):
         if isinstance(self.imp, LogisticRegression) or isinstance(self.imp, RidgeClassifier):
             self.abs_scores = abs(self.imp.coef_.mean(0))
 
-    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+    def _fit_path(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # Decreasing alphas from the smallest alpha, or the largest C, where all coefficients are zero
+        self.set_num_features(data)
+        if isinstance(self.imp, Lasso):
+            centered_labels = np.asarray(labels, dtype=np.float64) - np.mean(labels)
+            max_alpha = np.max(np.abs(data.T @ centered_labels)) / data.shape[0]
+        else:
+            max_alpha = 1 / l1_min_c(data, labels, loss="log")
+        alphas = np.geomspace(max_alpha, max_alpha * _PATH_EPS, _PATH_NUM_ALPHAS)
+
+        # Dense lasso is centered once, and the Gram matrix is shared by all alphas,
+        # each alpha warm starts from the coefficients of the previous one without another pass over the data
+        if isinstance(self.imp, Lasso) and not sparse.issparse(data):
+            values = np.asarray(data, dtype=np.float64)
+            values = np.asfortranarray(values - values.mean(axis=0))
+            gram, xy = values.T @ values, values.T @ centered_labels
+            coefficient = np.zeros(values.shape[1])
+
+            def fit_alpha(alpha):
+                nonlocal coefficient
+                coefficient = lasso_path(values, centered_labels, alphas=[alpha], precompute=gram, Xy=xy,
+                                         coef_init=coefficient, check_input=False)[1][:, 0]
+                return coefficient
+        else:
+            # Sparse lasso and l1 logistic warm start in the estimator from the coefficients of the previous alpha
+            def fit_alpha(alpha):
+                self.imp.set_params(**{"alpha": alpha} if isinstance(self.imp, Lasso) else {"C": 1 / alpha})
+                self.imp.fit(X=data, y=labels)
+                return self.imp.coef_
+
+        path_alphas, num_nonzeros, coefficients = [], [], []
+        for alpha in alphas:
+
+            # Features with a non-zero coefficient for any class, importance is averaged over classes as in fit
+            coefficient_of_classes = np.atleast_2d(fit_alpha(alpha))
+            path_alphas.append(alpha)
+            num_nonzeros.append(int(np.count_nonzero(np.any(coefficient_of_classes != 0, axis=0))))
+            coefficients.append(coefficient_of_classes.mean(0))
+            if num_nonzeros[-1] >= self.num_features:
+                break
+
+        self.abs_scores = abs(coefficients[-1])
+        self.diagnostics = {"alpha": path_alphas[-1], "alphas": path_alphas, "num_nonzeros": num_nonzeros,
+                            "coefficients": np.array(coefficients)}
+
+    def _fit_sgd(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # Standardize with the statistics of all rows, and all classes are known upfront
+        self._reset_sgd(labels)
+        chunk_size = max(1, _CHUNK_SIZE // max(1, data.shape[1]))
+        for start in range(0, data.shape[0], chunk_size):
+            rows = np.arange(start, min(start + chunk_size, data.shape[0]))
+            self._update_moments(self._get_rows(data, rows), labels.iloc[rows])
+
+        # Each epoch visits the rows in a new random order
+        # As in sklearn, stop when the progressive loss of an epoch does not improve the best loss by tol
+        rng = np.random.default_rng(self.seed)
+        best_loss = np.inf
+        for epoch in range(_SGD_MAX_EPOCHS):
+            num_losses = len(self.losses)
+            permutation = rng.permutation(data.shape[0])
+            for start in range(0, data.shape[0], chunk_size):
+                rows = np.sort(permutation[start:start + chunk_size])
+                self._update_sgd(self._get_rows(data, rows), labels.iloc[rows])
+            self.num_epochs = epoch + 1
+            if len(self.losses) > num_losses:
+                loss = np.mean(self.losses[num_losses:])
+                self.is_converged = loss > best_loss - _SGD_TOL
+                best_loss = min(best_loss, loss)
+                if self.is_converged:
+                    break
+
+        self.finalize()
+
+    def partial_fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # Only sgd learns from chunks
+        if self.solver != "sgd":
+            return super().partial_fit(data, labels)
+
+        # Classes are taken from the first chunk, standardization uses the statistics of the chunks so far
+        if self.moments is None:
+            self._reset_sgd(labels)
+        self._update_moments(data, labels)
+        self._update_sgd(data, labels)
+        self.is_converged = len(self.changes) > 0 and self.changes[-1] < _SGD_TOL
+        self.abs_scores = None
+
+    def finalize(self) -> NoReturn:
+
+        # Nothing to do unless sgd has new updates
+        if self.solver != "sgd" or self.changes is None or self.abs_scores is not None:
+            return
+
+        # Set importance as absolute averaged coefficients of standardized features, classes are averaged
+        self.abs_scores = abs(np.atleast_2d(self.imp.coef_).mean(0))
+        self.diagnostics = {"num_samples": self.moments.num_rows, "num_epochs": self.num_epochs,
+                            "losses": self.losses, "coefficient_changes": self.changes,
+                            "converged": self.is_converged}
+
+    def _reset_sgd(self, labels: pd.Series) -> NoReturn:
+        """
+        Starts sgd from scratch with the classes of the given labels.
+        """
+        self.imp = clone(self.imp)
+        self.moments = _RunningVariance()
+        self.label_moments = _RunningVariance()
+        self.classes = np.unique(labels) if isinstance(self.imp, SGDClassifier) else None
+        self.losses, self.changes, self.num_epochs, self.is_converged = [], [], None, False
+        self.abs_scores = None
+
+    def _update_moments(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+        """
+        Adds a chunk of rows to the statistics of features and regression labels.
+        """
+        self.moments.update(data if sparse.issparse(data) else np.asarray(data, dtype=np.float64))
+        if self.classes is None:
+            self.label_moments.update(np.asarray(labels, dtype=np.float64).reshape((-1, 1)))
+
+    def _update_sgd(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+        """
+        Takes a pass of sgd over a standardized chunk of rows.
+        Progressive loss of the chunk, before the update, and relative change of coefficients are recorded.
+        """
+        check_true(self.classes is None or np.all(np.isin(labels, self.classes)),
+                   ValueError("Classes of each chunk must be in the classes of the first chunk."))
+
+        # Zero variance features do not contribute
+        std = np.sqrt(self.moments.variance())
+        scale = np.divide(1, std, out=np.zeros_like(std), where=std > 0)
+        if sparse.issparse(data):
+            # Sparse data is scaled without centering, which keeps it sparse
+            values = sparse.csr_matrix(sparse.csr_matrix(data, dtype=np.float64).multiply(scale))
+        else:
+            values = (np.asarray(data, dtype=np.float64) - self.moments.mean) * scale
+
+        previous = self._get_coefficients()
+        if self.classes is None:
+            label_std = np.sqrt(self.label_moments.variance()[0])
+            targets = (np.asarray(labels, dtype=np.float64) - self.label_moments.mean[0]) / \
+                (label_std if label_std > 0 else 1)
+            if previous is not None:
+                self.losses.append(float(np.mean(np.square(targets - self.imp.predict(values)))))
+            self.imp.partial_fit(values, targets)
+        else:
+            if previous is not None:
+                self.losses.append(log_loss(labels, self.imp.predict_proba(values), labels=self.classes))
+            self.imp.partial_fit(values, labels, classes=self.classes)
+
+        if previous is not None:
+            self.changes.append(self._get_change(previous))
+
+    def _get_coefficients(self) -> Union[np.ndarray, None]:
+        """
+        Returns a copy of the averaged coefficients and intercepts, none before the first update.
+        """
+        if not hasattr(self.imp, "coef_"):
+            return None
+        return np.concatenate((np.ravel(self.imp.coef_), np.ravel(self.imp.intercept_)))
+
+    def _get_change(self, previous: np.ndarray) -> float:
+        """
+        Returns the norm of the change of coefficients relative to the norm of the coefficients.
+        """
+        coefficients = self._get_coefficients()
+        return float(np.linalg.norm(coefficients - previous) / max(np.linalg.norm(coefficients), 1e-12))
+
+    @staticmethod
+    def _get_rows(data: Union[pd.DataFrame, sparse.spmatrix], rows: np.ndarray) -> Union[pd.DataFrame, sparse.spmatrix]:
+        return data[rows] if sparse.issparse(data) else data.iloc[rows]
+
+    def transform(self, data: Union[pd.DataFrame, sparse.spmatrix]) -> Union[pd.DataFrame, sparse.spmatrix]:
 
         # Select top-k from data based on abs_scores and num_features
         return self.get_top_k(data, self.abs_scores)
+
+    def is_closed_form(self) -> bool:
+        """
+        Whether the linear model is least squares, with or without ridge, hence solved from a Gram matrix.
+        """
+        return isinstance(self.imp, (LinearRegression, Ridge, RidgeClassifier))
+
+    def get_fold_targets(self, labels: pd.Series) -> np.ndarray:
+        """
+        Returns the least squares targets of the model, one column per target.
+        RidgeClassifier regresses on -1/1 indicators of each class, one column for binary classes.
+        """
+        if isinstance(self.imp, RidgeClassifier):
+            return LabelBinarizer(pos_label=1, neg_label=-1).fit_transform(labels)
+        return np.asarray(labels, dtype=np.float64).reshape((-1, 1))
+
+    def fit_fold(self, folds: '_LinearFolds', fold: int, columns: np.ndarray) -> NoReturn:
+        """
+        Sets the importance as the absolute coefficients of the model fit on the training rows of the given fold,
+        i.e., all rows except the fold, from the statistics of the folds instead of another fit.
+        """
+        alpha = self.imp.get_params().get("alpha", 0)
+        coefficients = folds.get_coefficients(fold, columns, alpha)
+
+        # Classes without training rows in the fold are unknown to the model
+        if isinstance(self.imp, RidgeClassifier) and len(coefficients) > 1:
+            coefficients = coefficients[folds.get_positives(fold) > 0]
+
+        # Same importance as fit, classes are averaged
+        self.abs_scores = abs(coefficients.mean(0))
+
+
+class _LinearFolds:
+    """
+    Count, column sums, Gram matrix and cross products with the targets of each fold of rows.
+
+    The statistics of the training rows of a fold are the totals minus the statistics of the held-out fold.
+    Least squares and ridge of all folds then need a single pass over the data
+    and a p x p solve per fold, instead of a fit per fold.
+    """
+
+    def __init__(self, data: pd.DataFrame, targets: np.ndarray, folds: List[np.ndarray]):
+
+        # Shifted by the means of all rows, which does not change the solutions but avoids cancellation
+        values = np.asarray(data, dtype=np.float64)
+        values = values - values.mean(axis=0)
+        targets = np.asarray(targets, dtype=np.float64)
+        self.positives = np.array([np.sum(targets[index] > 0, axis=0) for index in folds])
+        targets = targets - targets.mean(axis=0)
+
+        self.count = np.array([len(index) for index in folds])
+        self.sums = np.array([values[index].sum(axis=0) for index in folds])
+        self.target_sums = np.array([targets[index].sum(axis=0) for index in folds])
+        self.gram = np.array([values[index].T @ values[index] for index in folds])
+        self.cross = np.array([values[index].T @ targets[index] for index in folds])
+
+    def get_positives(self, fold: int) -> np.ndarray:
+        """
+        Returns the number of positive targets of the training rows of the given fold, for each target.
+        """
+        return self.positives.sum(axis=0) - self.positives[fold]
+
+    def get_coefficients(self, fold: int, columns: np.ndarray, alpha: float) -> np.ndarray:
+        """
+        Returns the coefficients (targets x columns) of least squares with intercept and ridge penalty alpha,
+        fit on all rows except the given fold, and the given columns.
+        """
+
+        # Statistics of the training rows, centered by their means as with an intercept
+        count = np.sum(self.count) - self.count[fold]
+        sums = (self.sums.sum(axis=0) - self.sums[fold])[columns]
+        target_sums = self.target_sums.sum(axis=0) - self.target_sums[fold]
+        gram = (self.gram.sum(axis=0) - self.gram[fold])[np.ix_(columns, columns)] - np.outer(sums, sums) / count
+        cross = (self.cross.sum(axis=0) - self.cross[fold])[columns] - np.outer(sums, target_sums) / count
+        gram[np.diag_indices_from(gram)] += alpha
+
+        # Cholesky when positive definite, otherwise the minimum norm solution as in least squares
+        try:
+            coefficients = linalg.cho_solve(linalg.cho_factor(gram), cross)
+        except linalg.LinAlgError:
+            coefficients = linalg.lstsq(gram, cross)[0]
+
+        return coefficients.T
+
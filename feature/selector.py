@@ -12,11 +12,12 @@ This module defines the public interface of the **Selective Library** for featur
 
 import multiprocessing as mp
 from time import time
-from typing import Dict, Union, NamedTuple, NoReturn, Tuple, Optional
+from typing import Dict, List, Union, NamedTuple, NoReturn, Tuple, Optional
 
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from scipy import sparse
 from catboost import CatBoostClassifier, CatBoostRegressor
 from joblib import Parallel, delayed
 from lightgbm import LGBMClassifier, LGBMRegressor
@@ -29,7 +30,8 @@ from xgboost import XGBClassifier, XGBRegressor
 
 from feature.base import _BaseDispatcher, _BaseSupervisedSelector, _BaseUnsupervisedSelector
 from feature.correlation import _Correlation
-from feature.linear import _Linear
+from feature.linear import _Linear, _LinearFolds
+from feature.stability import _Stability
 from feature.statistical import _Statistical
 from feature.tree_based import _TreeBased
 from feature.utils import Num, check_true, Constants, normalize_columns
@@ -68,21 +70,58 @@ class SelectionMethod(NamedTuple):
         Example: a correlation of 0.5 means 0.5^2x100 = 25% of the variance in Y is "explained" or predicted X.
 
         Randomness:
-        Behavior is deterministic, does not depend on seed.
+        Behavior is deterministic, does not depend on seed, except for the approximate mode.
 
         Attributes
         ----------
         threshold: Num, optional
             Features with higher absolute correlation than this threshold will be removed.
             The default is to keep all features.
+            Pairs above the threshold are stored as a sparse graph of correlated features.
+            Memory is of order the number of correlated pairs,
+            hence at low thresholds, including the default of zero, nearly all num_features^2 / 2 pairs are stored,
+            which takes more memory than the dense correlation matrix (index and value for each pair).
+            Set a higher threshold on very wide data to keep the graph sparse.
         method: str, optional
             Method of correlation:
             * pearson : standard correlation coefficient (default)
             * kendall : Kendall Tau correlation coefficient
             * spearman : Spearman rank correlation
+        block_size: int, optional
+            Number of columns per block when computing Pearson correlation.
+            The full correlation matrix is never created, memory usage is of order num_features x block_size,
+            plus the graph of pairs above the threshold.
+            Default value is 1024.
+        dtype: str, optional
+            Floating point precision of the blocked Pearson correlation, float64 (default) or float32.
+            Using float32 halves the memory and speeds up matrix multiplication
+            at the cost of precision for correlations that are very close to the threshold.
+        n_jobs: int, optional
+            Number of concurrent threads used to compute Kendall Tau over blocks of feature pairs.
+            If set to -1, all CPUs are used.
+            Default value is one.
+        approximate: bool, optional
+            Whether to screen for highly correlated pairs approximately, for very wide data.
+            Only available for pearson and spearman methods.
+            Candidate pairs are proposed by locality sensitive hashing with random projections
+            of the standardized columns, and only the candidates are verified with exact correlation.
+            Mean absolute correlation is estimated against a random sample of features.
+            Behavior is non-deterministic, depends on seed.
+            Approximation quality, i.e., precision of candidates and estimated recall,
+            is reported in Selective.get_diagnostics().
+            Default is exact correlation.
+        recall: float, optional
+            Target probability of finding a pair with correlation equal to the threshold in approximate mode.
+            Higher recall uses more hash tables, and hence more time.
+            Default value is 0.95.
         """
         threshold: Num = 0.
         method: str = "pearson"
+        block_size: int = 1024
+        dtype: str = "float64"
+        n_jobs: int = 1
+        approximate: bool = False
+        recall: float = 0.95
 
         def _validate(self):
             check_true(isinstance(self.threshold, (int, float)), TypeError("Threshold must a non-negative number."))
@@ -90,6 +129,17 @@ class SelectionMethod(NamedTuple):
             check_true(self.threshold <= 1, ValueError("Threshold must be less or equal to one."))
             check_true(self.method in ["pearson", "kendall", "spearman"],
                        ValueError("Method of correlation can be pearson, kendall, or spearman."))
+            check_true(isinstance(self.block_size, int), TypeError("Block size must be an integer."))
+            check_true(self.block_size > 0, ValueError("Block size must be greater than zero."))
+            check_true(self.dtype in ["float64", "float32"], ValueError("Dtype can only be float64 or float32."))
+            check_true(isinstance(self.n_jobs, int), TypeError("Number of jobs must be an integer."))
+            check_true(self.n_jobs != 0, ValueError("Number of jobs cannot be zero."))
+            check_true(isinstance(self.approximate, bool), TypeError("Approximate must be a boolean."))
+            if self.approximate:
+                check_true(self.method in ["pearson", "spearman"],
+                           ValueError("Approximate correlation can only be pearson or spearman."))
+            check_true(isinstance(self.recall, float), TypeError("Recall must be a float."))
+            check_true(0 < self.recall < 1, ValueError("Recall must be between (0..1)."))
 
     class Linear(NamedTuple):
         """
@@ -151,13 +201,29 @@ class SelectionMethod(NamedTuple):
             If lasso, l1-norm regularization is applied.
             If ridge, l2-norm regularization is applied.
             Default is no regularization
-        alpha: Num, optional
+        alpha: Num or str, optional
             Regularization coefficient.
             Default value is one.
+            If "path" with lasso, the lasso (or l1 logistic) path is fit over decreasing alphas,
+            with warm starts for regression, until at least num_features coefficients are non-zero.
+            The alphas, number of non-zeros and coefficients along the path are available in diagnostics.
+        solver: str, optional
+            If exact, the linear model of the regularization is fit on all data.
+            If sgd, stochastic gradient descent with squared loss for regression, or log loss for classification,
+            is fit over chunks of rows with partial_fit, which scales to data that does not fit in memory.
+            Features, and regression labels, are standardized with running statistics of the chunks so far,
+            hence importance is the absolute averaged coefficient of the standardized feature.
+            Classes of classification are taken from the first chunk.
+            Fit takes passes over shuffled chunks until the loss of a pass does not improve by 1e-3, as in sklearn.
+            The progressive loss and relative change of coefficients of each chunk,
+            and whether fit stopped before 20 passes, or the last chunk of partial_fit changed coefficients
+            by less than 1e-3, are available in diagnostics.
+            Default is exact.
         """
         num_features: Num = 0.0
         regularization: str = "none"
-        alpha: Num = 1.0
+        alpha: Union[Num, str] = 1.0
+        solver: str = "exact"
 
         def _validate(self):
             check_true(isinstance(self.num_features, (int, float)), TypeError("Num features must a number."))
@@ -166,8 +232,13 @@ class SelectionMethod(NamedTuple):
                 check_true(self.num_features <= 1, ValueError("Num features ratio must be between [0..1]."))
             check_true(self.regularization in ["none", "lasso", "ridge"],
                        ValueError("Regularization can only be none, lasso, or ridge."))
-            check_true(isinstance(self.alpha, (int, float)), TypeError("Alpha must a number."))
-            check_true(self.alpha >= 0, ValueError("Alpha cannot be negative"))
+            check_true(self.solver in ["exact", "sgd"], ValueError("Solver can only be exact or sgd."))
+            if self.alpha == "path":
+                check_true(self.regularization == "lasso", ValueError("Alpha path can only be used with lasso."))
+                check_true(self.solver == "exact", ValueError("Alpha path can only be used with exact solver."))
+            else:
+                check_true(isinstance(self.alpha, (int, float)), TypeError("Alpha must a number."))
+                check_true(self.alpha >= 0, ValueError("Alpha cannot be negative"))
 
     class Statistical(NamedTuple):
         """
@@ -201,9 +272,14 @@ class SelectionMethod(NamedTuple):
         For continuous variables binning/discretaion is required but
         the results might be sensitive to exact bin selection.
 
+        ANOVA and ChiSquare can score multiple targets at once, given as the columns of a labels dataframe.
+        Scores are then a dataframe of targets (rows) and features (columns),
+        and transform returns the top features of each target in a dictionary.
+
         Maximal information score (MIC) tries to address these gaps by
         searching for the optimal binning strategy.
-        Note: MIC is dropped from Selective due to inactive MINE library
+        MIC is normalized between 0 and 1, and can be applied to both regression and classification problems.
+        Note: MIC is approximated by a search over equal frequency grids, instead of the inactive MINE library
 
         Notes on Randomness:
             - Mutual Info is non-deterministic, depends on the seed value.
@@ -219,18 +295,70 @@ class SelectionMethod(NamedTuple):
             * anova: Anova and Anova F-test (default)
             * chi_square: Chi-Square
             * mutual_info: Mutual Information score
+            * maximal_info: Maximal Information Coefficient (MIC)
             * variance_inflation: Variance Inflation factor (VIF)
+        vif_threshold: Num, optional
+            If given with variance_inflation, features are eliminated stepwise instead of top-k.
+            The feature with the largest VIF is dropped and VIF of the rest are updated,
+            until all VIF are less than vif_threshold or only num_features features remain.
+            The elimination order and the largest VIF at each step are available in diagnostics.
+            Common values are 5 or 10.
+        n_jobs: int, optional
+            Number of concurrent threads to score features with mutual_info or maximal_info.
+            If set to -1, all CPUs are used.
+            Scores do not depend on the number of jobs.
+        estimator: str, optional
+            Estimator of mutual_info:
+            * knn: Nearest neighbor estimate, same as sklearn (default)
+            * binned: Joint histograms of binned features, linear time for large data
+        num_bins: int, optional
+            Maximum number of bins of each feature, and continuous target, with the binned estimator.
+        binning: str, optional
+            Bins of the binned estimator:
+            * quantile: Bins with equal number of rows (default)
+            * uniform: Bins with equal width
+        num_permutations: int, optional
+            If given with anova or chi_square, p-values of the scores are estimated
+            against the scores of num_permutations random permutations of the labels.
+            Unlike scores, p-values are comparable across datasets.
+            The p-value of a score is (1 + number of permuted scores >= score) / (1 + num_permutations).
         """
         num_features: Num = 0.0
         method: str = "anova"
+        vif_threshold: Optional[Num] = None
+        n_jobs: int = 1
+        estimator: str = "knn"
+        num_bins: int = 32
+        binning: str = "quantile"
+        num_permutations: Optional[int] = None
 
         def _validate(self):
             check_true(isinstance(self.num_features, (int, float)), TypeError("Num features must a number."))
             check_true(self.num_features > 0, ValueError("Num features must be greater than zero."))
             if isinstance(self.num_features, float):
                 check_true(self.num_features <= 1, ValueError("Num features ratio must be between [0..1]."))
-            check_true(self.method in ["anova", "chi_square", "mutual_info", "variance_inflation"], # "maximal_info" dropped
-                       ValueError("Statistical method can only be anova, chi_square, or mutual_info."))
+            check_true(self.method in ["anova", "chi_square", "mutual_info", "maximal_info", "variance_inflation"],
+                       ValueError("Statistical method can only be anova, chi_square, mutual_info, maximal_info, "
+                                  "or variance_inflation."))
+            if self.vif_threshold is not None:
+                check_true(self.method == "variance_inflation",
+                           ValueError("VIF threshold can only be used with variance_inflation."))
+                check_true(isinstance(self.vif_threshold, (int, float)), TypeError("VIF threshold must be a number."))
+                check_true(self.vif_threshold > 0, ValueError("VIF threshold must be greater than zero."))
+            check_true(isinstance(self.n_jobs, int), TypeError("Number of jobs must be an integer."))
+            check_true(self.n_jobs != 0, ValueError("Number of jobs cannot be zero."))
+            check_true(self.estimator in ["knn", "binned"], ValueError("Estimator can only be knn or binned."))
+            if self.estimator == "binned":
+                check_true(self.method == "mutual_info",
+                           ValueError("Binned estimator can only be used with mutual_info."))
+            check_true(isinstance(self.num_bins, int), TypeError("Number of bins must be an integer."))
+            check_true(2 <= self.num_bins <= 2 ** 16, ValueError("Number of bins must be between [2..65536]."))
+            check_true(self.binning in ["quantile", "uniform"], ValueError("Binning can only be quantile or uniform."))
+            if self.num_permutations is not None:
+                check_true(self.method in ["anova", "chi_square"],
+                           ValueError("Permutations can only be used with anova and chi_square."))
+                check_true(isinstance(self.num_permutations, int), TypeError("Permutations must be an integer."))
+                check_true(self.num_permutations > 0, ValueError("Permutations must be greater than zero."))
 
     class TreeBased(NamedTuple):
         """
@@ -245,6 +373,32 @@ class SelectionMethod(NamedTuple):
             If integer, select top num_features.
             If float, select the top num_features percentile.
         estimator : tree-model, xgboost, ligthgbm, catboost
+        batch_size : int, optional
+            If given, the trees are grown with warm start, batch_size trees at a time,
+            up to the number of trees of the estimator.
+            Growing stops early when importances are stable, i.e., the top num_features are the same
+            and the Spearman rank correlation of importances with the previous batch is at least 0.95,
+            for two consecutive batches.
+            The number of trees, rank correlations, and whether the top num_features are the same
+            after each batch are available in diagnostics.
+            Only random forest, extra trees, and gradient boosting estimators can grow with warm start.
+            Default is to fit all trees at once.
+        importance : str, optional
+            If impurity, importance is the feature_importances_ of the estimator,
+            i.e., impurity decrease or gain, which is biased towards features with many unique values.
+            If permutation, importance is the mean decrease of the score of the estimator on the training data,
+            accuracy for classification and R^2 for regression, when a feature is permuted, over 5 permutations.
+            Since there is no held-out data, features the estimator overfits can get high importance.
+            Permuted copies of the data are allocated once, float32 for sklearn trees and float64 for boosting,
+            and predicted in large batches.
+            The baseline score and the standard deviation of importances are available in diagnostics.
+            Default is impurity.
+        n_jobs : int, optional
+            Number of concurrent threads to use for permutation importance, across features.
+            If set to -1, all CPUs are used.
+            If set to -2, all CPUs but one are used, and so on.
+            Memory of permuted copies is shared by all threads.
+            Default value is 1.
         """
         num_features: Num = 0.0
         estimator: Optional[Union[RandomForestRegressor, RandomForestClassifier,
@@ -254,6 +408,9 @@ class SelectionMethod(NamedTuple):
                                   GradientBoostingClassifier, GradientBoostingRegressor,
                                   AdaBoostClassifier, AdaBoostRegressor,
                                   CatBoostClassifier, CatBoostRegressor]] = None
+        batch_size: Optional[int] = None
+        importance: str = "impurity"
+        n_jobs: int = 1
 
         def _validate(self):
             check_true(isinstance(self.num_features, (int, float)), TypeError("Num features must a number."))
@@ -269,6 +426,19 @@ class SelectionMethod(NamedTuple):
                                                        AdaBoostClassifier, AdaBoostRegressor,
                                                        CatBoostClassifier, CatBoostRegressor)),
                            ValueError("Unknown tree-based estimator" + str(self.estimator)))
+            if self.batch_size is not None:
+                check_true(isinstance(self.batch_size, int), TypeError("Batch size must be an integer."))
+                check_true(self.batch_size > 0, ValueError("Batch size must be greater than zero."))
+                check_true(self.estimator is None or
+                           isinstance(self.estimator, (RandomForestRegressor, RandomForestClassifier,
+                                                       ExtraTreesClassifier, ExtraTreesRegressor,
+                                                       GradientBoostingClassifier, GradientBoostingRegressor)),
+                           ValueError("Batch size can only be used with random forest, extra trees, "
+                                      "and gradient boosting estimators."))
+            check_true(self.importance in ["impurity", "permutation"],
+                       ValueError("Importance can only be impurity or permutation."))
+            check_true(isinstance(self.n_jobs, int), TypeError("Number of jobs must be an integer."))
+            check_true(self.n_jobs != 0, ValueError("Number of jobs cannot be zero."))
 
     class Variance(NamedTuple):
         """
@@ -303,6 +473,53 @@ class SelectionMethod(NamedTuple):
             check_true(isinstance(self.threshold, (int, float)), TypeError("Threshold must a non-negative number."))
             check_true(self.threshold >= 0, ValueError("Threshold must be non-negative."))
 
+    class Stability(NamedTuple):
+        """
+        Stability selection that fits a Linear or TreeBased selector on random halves of the rows.
+
+        Lasso and tree importances can change a lot with small changes in data, especially with correlated features.
+        Stability selection counts how often each feature is selected by the given method
+        over many random subsamples of half of the rows, as in Meinshausen and Bühlmann (2010).
+        Features that are selected in most subsamples are stable, regardless of the scale of their scores.
+
+        A feature is selected in a subsample when it is among the top num_features of the method
+        with a non-zero score, hence lasso selects no more than its non-zero coefficients.
+        Importance is the selection probability of each feature,
+        and the top num_features of the method are selected.
+
+        Subsamples are fit in parallel processes in batches.
+        Data is passed to the processes as arrays, which are memory mapped for large data instead of copied,
+        and each process gathers the rows of its subsamples.
+
+        Randomness:
+        Subsamples depend on seed.
+
+        Attributes
+        ----------
+        method: Union[SelectionMethod.Linear, SelectionMethod.TreeBased]
+            Selection method fit on each subsample.
+        num_subsamples: int, optional
+            Number of random subsamples.
+            Default value is 100.
+        n_jobs: int, optional
+            Number of concurrent processes to use for fitting the subsamples.
+            If set to -1, all CPUs are used.
+            If set to -2, all CPUs but one are used, and so on.
+            Default value is 1.
+        """
+        method: Union['SelectionMethod.Linear', 'SelectionMethod.TreeBased']
+        num_subsamples: int = 100
+        n_jobs: int = 1
+
+        def _validate(self):
+            check_true(isinstance(self.method, (SelectionMethod.Linear, SelectionMethod.TreeBased)),
+                       TypeError("Stability method must be Linear or TreeBased."))
+            self.method._validate()
+            check_true(isinstance(self.num_subsamples, int), TypeError("Num subsamples must be an integer."))
+            check_true(self.num_subsamples > 0, ValueError("Num subsamples must be greater than zero."))
+            check_true(isinstance(self.n_jobs, int), TypeError("Number of jobs must be an integer."))
+            check_true(self.n_jobs != 0, ValueError("Number of jobs cannot be zero."))
+
 
 class Selective:
     """**Selective: Feature Selection Library**
@@ -338,7 +555,8 @@ class Selective:
                                                SelectionMethod.Linear,
                                                SelectionMethod.TreeBased,
                                                SelectionMethod.Statistical,
-                                               SelectionMethod.Variance],
+                                               SelectionMethod.Variance,
+                                               SelectionMethod.Stability],
                  seed: int = Constants.default_seed):
         """Initializes a feature selector with the given selection method.
 
@@ -375,20 +593,33 @@ class Selective:
         # Set the selector implementation
         self._imp: Union[None, _BaseUnsupervisedSelector, _BaseSupervisedSelector] = None
         if isinstance(selection_method, SelectionMethod.Correlation):
-            self._imp = _Correlation(self.seed, self.selection_method.threshold, self.selection_method.method)
+            self._imp = _Correlation(self.seed, self.selection_method.threshold, self.selection_method.method,
+                                     self.selection_method.block_size, self.selection_method.dtype,
+                                     self.selection_method.n_jobs, self.selection_method.approximate,
+                                     self.selection_method.recall)
         elif isinstance(selection_method, SelectionMethod.Linear):
             self._imp = _Linear(self.seed, self.selection_method.num_features,
-                                self.selection_method.regularization, self.selection_method.alpha)
+                                self.selection_method.regularization, self.selection_method.alpha,
+                                self.selection_method.solver)
         elif isinstance(selection_method, SelectionMethod.TreeBased):
-            self._imp = _TreeBased(self.seed, self.selection_method.num_features, self.selection_method.estimator)
+            self._imp = _TreeBased(self.seed, self.selection_method.num_features, self.selection_method.estimator,
+                                   self.selection_method.batch_size, self.selection_method.importance,
+                                   self.selection_method.n_jobs)
         elif isinstance(selection_method, SelectionMethod.Statistical):
-            self._imp = _Statistical(self.seed, self.selection_method.num_features, self.selection_method.method)
+            self._imp = _Statistical(self.seed, self.selection_method.num_features, self.selection_method.method,
+                                     self.selection_method.vif_threshold, self.selection_method.n_jobs,
+                                     self.selection_method.estimator, self.selection_method.num_bins,
+                                     self.selection_method.binning, self.selection_method.num_permutations)
         elif isinstance(selection_method, SelectionMethod.Variance):
             self._imp = _Variance(self.seed, self.selection_method.threshold)
+        elif isinstance(selection_method, SelectionMethod.Stability):
+            self._imp = _Stability(self.seed, Selective(self.selection_method.method, self.seed),
+                                   self.selection_method.num_subsamples, self.selection_method.n_jobs)
         else:
             raise ValueError("Unknown Selection Method " + str(selection_method))
 
-    def fit(self, data: pd.DataFrame, labels: Optional[pd.Series] = None) -> NoReturn:
+    def fit(self, data: Union[pd.DataFrame, sparse.spmatrix],
+            labels: Optional[Union[pd.Series, pd.DataFrame]] = None) -> NoReturn:
 
         # Validate
         self._validate_fit(data, labels)
@@ -406,25 +637,85 @@ class Selective:
         # Activate initial fit flag
         self._is_initial_fit = True
 
-    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+    def partial_fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: Optional[pd.Series] = None) \
+            -> NoReturn:
+
+        # Validate
+        self._validate_fit(data, labels)
+
+        # Initialize underlying machine learning model on the first chunk, if dispatcher used
+        if isinstance(self._imp, _BaseDispatcher) and not self._is_initial_fit:
+            self._imp.dispatch_model(labels, self._imp.get_model_args(self.selection_method))
+
+        # Accumulate the chunk depending on the task
+        if isinstance(self._imp, _BaseSupervisedSelector):
+            self._imp.partial_fit(data, labels)
+        else:
+            self._imp.partial_fit(data)
+
+        # Activate initial fit flag
+        self._is_initial_fit = True
+
+    def merge(self, other: 'Selective') -> NoReturn:
+
+        # Check that both selectors are fit with the same method, e.g., on different shards of rows
+        check_true(self._is_initial_fit and other._is_initial_fit, Exception("Call fit before merge"))
+        check_true(self.selection_method == other.selection_method,
+                   ValueError("Only selectors with the same selection method can be merged."))
+
+        # Combine the statistics
+        self._imp.merge(other._imp)
+
+    def transform(self, data: Union[pd.DataFrame, sparse.spmatrix]) \
+            -> Union[pd.DataFrame, sparse.spmatrix, Dict[str, Union[pd.DataFrame, sparse.spmatrix]]]:
 
         # Check that fit is called before
         check_true(self._is_initial_fit, Exception("Call fit before transform"))
 
+        # Complete partial fit, if any
+        self._imp.finalize()
+
         # Return transformed data
         return self._imp.transform(data)
 
-    def fit_transform(self, data: pd.DataFrame, labels: Optional[pd.Series] = None) -> pd.DataFrame:
+    def fit_transform(self, data: Union[pd.DataFrame, sparse.spmatrix],
+                      labels: Optional[Union[pd.Series, pd.DataFrame]] = None) \
+            -> Union[pd.DataFrame, sparse.spmatrix, Dict[str, Union[pd.DataFrame, sparse.spmatrix]]]:
         self.fit(data, labels)
         return self.transform(data)
 
-    def get_absolute_scores(self) -> np.ndarray:
+    def get_absolute_scores(self) -> Union[np.ndarray, pd.DataFrame]:
 
         # Check that fit is called before
         check_true(self._is_initial_fit, Exception("Call fit before getting importances"))
 
+        # Complete partial fit, if any
+        self._imp.finalize()
+
         return self._imp.abs_scores
 
+    def get_p_values(self) -> Optional[Union[np.ndarray, pd.DataFrame]]:
+
+        # Check that fit is called before
+        check_true(self._is_initial_fit, Exception("Call fit before getting p-values"))
+        check_true(isinstance(self._imp, _Statistical),
+                   ValueError("P-values are only available for Statistical methods."))
+
+        # Complete partial fit, if any
+        self._imp.finalize()
+
+        return self._imp.p_values
+
+    def get_diagnostics(self) -> Optional[dict]:
+
+        # Check that fit is called before
+        check_true(self._is_initial_fit, Exception("Call fit before getting diagnostics"))
+
+        # Complete partial fit, if any
+        self._imp.finalize()
+
+        return self._imp.diagnostics
+
     @staticmethod
     def _validate_args(seed, selection_method) -> NoReturn:
         """
@@ -440,7 +731,8 @@ class Selective:
                                                  SelectionMethod.Linear,
                                                  SelectionMethod.TreeBased,
                                                  SelectionMethod.Statistical,
-                                                 SelectionMethod.Variance)),
+                                                 SelectionMethod.Variance,
+                                                 SelectionMethod.Stability)),
                    TypeError("Unknown selection type: " + str(selection_method) + " " + str(type(selection_method))))
 
         # Selection method value
@@ -448,6 +740,14 @@ class Selective:
 
     def _validate_fit(self, data, labels):
 
+        # Sparse data is supported by methods that never densify it
+        if sparse.issparse(data):
+            check_true(isinstance(self._imp, (_Variance, _Linear)) or
+                       (isinstance(self._imp, _Statistical) and self.selection_method.method in ["anova", "chi_square"]) or
+                       (isinstance(self._imp, _Stability) and isinstance(self._imp.selector._imp, _Linear)),
+                       ValueError("Sparse data is only supported for Variance, Linear, Stability of Linear, "
+                                  "and Statistical anova and chi_square methods."))
+
         # VIF is a Statistical methods, hence BaseSupervised, but does not need labels
         if isinstance(self._imp, _Statistical) and self.selection_method.method == "variance_inflation":
             pass
@@ -455,20 +755,33 @@ class Selective:
             # Supervised implementors, except VIF, require labels
             if isinstance(self._imp, _BaseSupervisedSelector):
                 check_true(labels is not None, ValueError("Labels column cannot be none"))
-                check_true(isinstance(labels, pd.Series), ValueError("Labels should be a pandas series/column."))
-
-        if not hasattr(self.selection_method, 'num_features'):
+                if isinstance(labels, pd.DataFrame):
+                    # Multiple targets in columns are scored at once
+                    check_true(isinstance(self._imp, _Statistical) and
+                               self.selection_method.method in ["anova", "chi_square"],
+                               ValueError("Labels of multiple targets are only supported for "
+                                          "Statistical anova and chi_square methods."))
+                    check_true(len(labels.columns) > 0, ValueError("Labels should have at least one target."))
+                else:
+                    check_true(isinstance(labels, pd.Series), ValueError("Labels should be a pandas series/column."))
+
+        # Stability selects the num_features of its method
+        selection_method = self.selection_method
+        if isinstance(selection_method, SelectionMethod.Stability):
+            selection_method = selection_method.method
+
+        if not hasattr(selection_method, 'num_features'):
             return
 
-        if not isinstance(self.selection_method.num_features, int):
+        if not isinstance(selection_method.num_features, int):
             return
 
         # Num features when integer, should be less or equal to size of feature columns
         # When float case is validated when selection method is created
-        check_true(self.selection_method.num_features <= len(data.columns),
+        check_true(selection_method.num_features <= data.shape[1],
                    ValueError("num_features cannot exceed size of feature columns " +
-                              str(self.selection_method.num_features) + " vs. " +
-                              str(len(data.columns))))
+                              str(selection_method.num_features) + " vs. " +
+                              str(data.shape[1])))
 
 
 def benchmark(selectors: Dict[str, Union[SelectionMethod.Correlation,
@@ -544,6 +857,15 @@ def benchmark(selectors: Dict[str, Union[SelectionMethod.Correlation,
         train_labels, test_labels = None, None
         score_df, selected_df, runtime_df = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
+        # Least squares and ridge selectors solve each fold from the statistics of all folds
+        # Other selectors are fit on each fold from scratch
+        folds = [test_index for _, test_index in kf.split(data)]
+        closed_form = _get_closed_form(selectors, data, labels)
+        other_selectors = {method_name: method for method_name, method in selectors.items()
+                           if method_name not in closed_form}
+        closed_form_results = _bench_closed_form(closed_form, data, labels, folds, output_filename,
+                                                 drop_zero_variance_features, verbose)
+
         # Split data into cv-folds and run _bench for each fold
         if verbose:
             print("\n>>> Running")
@@ -558,13 +880,23 @@ def benchmark(selectors: Dict[str, Union[SelectionMethod.Correlation,
                 train_labels = labels.iloc[train_index]
 
             # Run benchmark
-            score_cv_df, selected_cv_df, runtime_cv_df = _bench(selectors=selectors,
-                                                                data=train_data,
-                                                                labels=train_labels,
-                                                                output_filename=output_filename,
-                                                                drop_zero_variance_features=drop_zero_variance_features,
-                                                                verbose=False,
-                                                                n_jobs=n_jobs)
+            score_cv_df, selected_cv_df, runtime_cv_df = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+            if len(other_selectors) > 0:
+                score_cv_df, selected_cv_df, runtime_cv_df = _bench(selectors=other_selectors,
+                                                                    data=train_data,
+                                                                    labels=train_labels,
+                                                                    output_filename=output_filename,
+                                                                    drop_zero_variance_features=
+                                                                    drop_zero_variance_features,
+                                                                    verbose=False,
+                                                                    n_jobs=n_jobs)
+
+            # Add closed form results, in the given order of selectors
+            if len(closed_form) > 0:
+                score_cv_df, selected_cv_df, runtime_cv_df = _merge_closed_form(selectors,
+                                                                                closed_form_results[fold],
+                                                                                score_cv_df, selected_cv_df,
+                                                                                runtime_cv_df)
 
             # Concatenate data frames
             score_df = pd.concat((score_df, score_cv_df))
@@ -616,29 +948,42 @@ def _bench(selectors: Dict[str, Union[SelectionMethod.Correlation,
     score_df = pd.DataFrame(index=data.columns)
     selected_df = pd.DataFrame(index=data.columns)
 
+    # Correlation selectors that differ only in threshold share a single fit
+    # Approximate screening depends on the threshold, hence approximate selectors are fit one by one
+    sweeps = {}
+    for method_name, method in selectors.items():
+        if isinstance(method, SelectionMethod.Correlation) and not method.approximate:
+            sweeps.setdefault(method._replace(threshold=0), []).append(method_name)
+    sweep_names = [method_names for method_names in sweeps.values() if len(method_names) > 1]
+    swept = set(method_name for method_names in sweep_names for method_name in method_names)
+
     # Find the effective number of jobs
-    size = len(selectors.items())
+    size = len(selectors.items()) - len(swept) + len(sweep_names)
     if n_jobs < 0:
         n_jobs = max(mp.cpu_count() + 1 + n_jobs, 1)
     n_jobs = min(n_jobs, size)
 
-    # Parallel benchmarks for each method
+    # Parallel benchmarks for each method, and for each group of thresholds
     output_list = Parallel(n_jobs=n_jobs, require="sharedmem")(
-        delayed(_parallel_bench)(
-            data, labels, method_name, method, verbose)
-        for method_name, method in selectors.items())
-
-    # Collect the output from each method
-    for output in output_list:
-        for method_name, results_dict in output.items():
-            score_df[method_name] = results_dict["scores"]
-            selected_df[method_name] = results_dict["selected"]
-            method_to_runtime[method_name] = results_dict["runtime"]
-
-            if output_filename is not None:
-                output_file.write(method_name + " " + str(method_to_runtime[method_name]) + "\n")
-                output_file.write(str(results_dict["selected"]) + "\n")
-                output_file.write(str(results_dict["scores"]) + "\n")
+        [delayed(_parallel_bench)(data, labels, method_name, method, verbose)
+         for method_name, method in selectors.items() if method_name not in swept] +
+        [delayed(_parallel_sweep)(data, {method_name: selectors[method_name] for method_name in method_names},
+                                  verbose)
+         for method_names in sweep_names])
+    name_to_results = {method_name: results_dict
+                       for output in output_list for method_name, results_dict in output.items()}
+
+    # Collect the output from each method, in the given order
+    for method_name in selectors.keys():
+        results_dict = name_to_results[method_name]
+        score_df[method_name] = results_dict["scores"]
+        selected_df[method_name] = results_dict["selected"]
+        method_to_runtime[method_name] = results_dict["runtime"]
+
+        if output_filename is not None:
+            output_file.write(method_name + " " + str(method_to_runtime[method_name]) + "\n")
+            output_file.write(str(results_dict["selected"]) + "\n")
+            output_file.write(str(results_dict["scores"]) + "\n")
 
     # Format
     runtime_df = pd.Series(method_to_runtime).to_frame("runtime").rename_axis("method").reset_index()
@@ -693,6 +1038,254 @@ def _parallel_bench(data: pd.DataFrame,
     return {method_name: results_dict}
 
 
+def _get_closed_form(selectors: Dict[str, Union[SelectionMethod.Correlation,
+                                                SelectionMethod.Linear,
+                                                SelectionMethod.TreeBased,
+                                                SelectionMethod.Statistical,
+                                                SelectionMethod.Variance]],
+                     data: pd.DataFrame,
+                     labels: Optional[pd.Series]) -> Dict[str, SelectionMethod.Linear]:
+    """
+    Returns the linear selectors with least squares or ridge models, which are solved in closed form.
+    Data and labels must be numeric without missing values, otherwise selectors are fit as usual.
+    """
+
+    # Closed form requires finite numeric data and labels
+    if labels is None or not _is_finite_numeric(data) or not _is_finite_numeric(labels.to_frame()):
+        return {}
+
+    closed_form = {}
+    for method_name, method in selectors.items():
+        if not isinstance(method, SelectionMethod.Linear) or method.alpha == "path":
+            continue
+        try:
+            selector = Selective(method)
+        except (TypeError, ValueError):
+            continue
+        selector._imp.dispatch_model(labels, selector._imp.get_model_args(method))
+        if selector._imp.is_closed_form():
+            closed_form[method_name] = method
+
+    return closed_form
+
+
+def _is_finite_numeric(data: pd.DataFrame) -> bool:
+    """
+    Whether the data frame has numeric columns only, without missing or infinite values.
+    """
+    return isinstance(data, pd.DataFrame) and \
+        all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes) and \
+        bool(np.all(np.isfinite(data.to_numpy(dtype=np.float64))))
+
+
+def _bench_closed_form(selectors: Dict[str, SelectionMethod.Linear],
+                       data: pd.DataFrame,
+                       labels: pd.Series,
+                       folds: List[np.ndarray],
+                       output_filename: Optional[str],
+                       drop_zero_variance_features: bool,
+                       verbose: bool) -> List[Dict[str, Dict[str, Union[pd.DataFrame, list, float]]]]:
+    """
+    Benchmark least squares and ridge selectors on the training rows of each fold.
+    Return a list with a dictionary of feature selection method names with their corresponding scores,
+    selected features and runtime for each fold.
+
+    The Gram matrix and the cross products with the labels are computed once for each fold of rows.
+    Training statistics of a fold are the totals minus the held-out fold, which leaves a p x p solve per fold.
+    Runtime of each fold includes its share of the statistics.
+    """
+
+    if len(selectors) == 0:
+        return []
+
+    t0 = time()
+    if verbose:
+        run_str = "\n>>> Running " + ", ".join(selectors.keys()) + " on all folds"
+        print(run_str, flush=True)
+
+    # Least squares targets are the same for all selectors of a task
+    selector = Selective(next(iter(selectors.values())))
+    selector._imp.dispatch_model(labels, selector._imp.get_model_args(selector.selection_method))
+    linear_folds = _LinearFolds(data, selector._imp.get_fold_targets(labels), folds)
+    share = (time() - t0) / (len(folds) * len(selectors))
+
+    results = []
+    all_index = np.arange(len(data))
+    for fold, test_index in enumerate(folds):
+
+        # Drop features without any variance in the training rows
+        train_data = data.iloc[np.setdiff1d(all_index, test_index)]
+        if drop_zero_variance_features:
+            train_data = Selective(SelectionMethod.Variance()).fit_transform(train_data)
+        columns = data.columns.get_indexer(train_data.columns)
+
+        name_to_results = {}
+        for method_name, method in selectors.items():
+            t1 = time()
+            try:
+                selector = Selective(method)
+                selector._imp.dispatch_model(labels, selector._imp.get_model_args(method))
+                selector._imp.fit_fold(linear_folds, fold, columns)
+                scores = selector._imp.abs_scores
+                subset = selector._imp.transform(train_data)
+                selected = [1 if c in subset.columns else 0 for c in train_data.columns]
+                runtime = round((time() - t1 + share) / 60, 2)
+            except Exception as exp:
+                print("Exception", exp)
+                scores = np.repeat(0, len(train_data.columns))
+                selected = np.repeat(0, len(train_data.columns))
+                runtime = str(round((time() - t1 + share) / 60, 2)) + " (exception)"
+            name_to_results[method_name] = {"scores": scores, "selected": selected, "runtime": runtime,
+                                            "columns": train_data.columns}
+
+            if output_filename is not None:
+                with open(output_filename, "a") as output_file:
+                    output_file.write(method_name + " " + str(runtime) + "\n")
+                    output_file.write(str(selected) + "\n")
+                    output_file.write(str(scores) + "\n")
+        results.append(name_to_results)
+
+    if verbose:
+        done_str = f"<<< Done! {', '.join(selectors.keys())} Time taken: {(time() - t0) / 60:.2f} minutes"
+        print(done_str, flush=True)
+
+    return results
+
+
+def _merge_closed_form(selectors: Dict[str, Union[SelectionMethod.Correlation,
+                                                  SelectionMethod.Linear,
+                                                  SelectionMethod.TreeBased,
+                                                  SelectionMethod.Statistical,
+                                                  SelectionMethod.Variance]],
+                       name_to_results: Dict[str, Dict[str, Union[pd.DataFrame, list, float]]],
+                       score_df: pd.DataFrame,
+                       selected_df: pd.DataFrame,
+                       runtime_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Adds the closed form results of a fold to the benchmark results of the other selectors on the same fold.
+    Return a tuple of data frames with scores, selected features and runtime, with methods in the given order.
+    """
+
+    # Both sides drop the same zero variance features of the training rows
+    columns = next(iter(name_to_results.values()))["columns"]
+    if len(score_df.columns) == 0:
+        score_df, selected_df = pd.DataFrame(index=columns), pd.DataFrame(index=columns)
+    for method_name, results_dict in name_to_results.items():
+        score_df[method_name] = results_dict["scores"]
+        selected_df[method_name] = results_dict["selected"]
+
+    # Runtime rows in the given order
+    method_to_runtime = dict(zip(runtime_df["method"], runtime_df["runtime"])) if len(runtime_df) > 0 else {}
+    method_to_runtime.update({method_name: results_dict["runtime"]
+                              for method_name, results_dict in name_to_results.items()})
+    method_names = list(selectors.keys())
+    runtime_df = pd.Series({method_name: method_to_runtime[method_name] for method_name in method_names}) \
+        .to_frame("runtime").rename_axis("method").reset_index()
+
+    return score_df[method_names], selected_df[method_names], runtime_df
+
+
+def _parallel_sweep(data: pd.DataFrame,
+                    selectors: Dict[str, SelectionMethod.Correlation],
+                    verbose: bool) \
+                -> Dict[str, Dict[str, Union[pd.DataFrame, list, float]]]:
+    """
+    Benchmark correlation selectors that differ only in threshold with a single fit.
+    Return a dictionary of feature selection method names with their corresponding scores,
+    selected features and runtime.
+
+    Returns
+    -------
+    Dictionary of feature selection method names with their corresponding scores, selected features
+    and runtime. Runtime is the time of the shared fit.
+    """
+
+    # Validate each threshold, a single selector is created for the smallest one
+    for method in selectors.values():
+        method._validate()
+
+    method_names = list(selectors.keys())
+    thresholds = [method.threshold for method in selectors.values()]
+    selector = Selective(selectors[method_names[0]]._replace(threshold=min(thresholds)))
+    t0 = time()
+    if verbose:
+        run_str = "\n>>> Running " + ", ".join(method_names)
+        print(run_str, flush=True)
+
+    try:
+        selector.fit(data)
+        scores = selector.get_absolute_scores()
+        selected = _get_selected(selector, data, thresholds)
+        selected = [list(selected.iloc[:, i]) for i in range(len(thresholds))]
+        runtime = round((time() - t0) / 60, 2)
+    except Exception as exp:
+        print("Exception", exp)
+        scores = np.repeat(0, len(data.columns))
+        selected = [np.repeat(0, len(data.columns))] * len(thresholds)
+        runtime = str(round((time() - t0) / 60, 2)) + " (exception)"
+    finally:
+        if verbose:
+            done_str = f"<<< Done! {', '.join(method_names)} Time taken: {(time() - t0) / 60:.2f} minutes"
+            print(done_str, flush=True)
+
+    return {method_name: {"scores": scores, "selected": selected[i], "runtime": runtime}
+            for i, method_name in enumerate(method_names)}
+
+
+def correlation_sweep(selection_method: SelectionMethod.Correlation,
+                      data: pd.DataFrame,
+                      thresholds: List[float],
+                      seed: int = Constants.default_seed) -> pd.DataFrame:
+    """
+    Fit correlation once and find the selected features for each of the given thresholds.
+    Return a data frame with selection flag for each feature (index) and threshold (columns).
+
+    A feature is dropped at a threshold when its largest absolute correlation with a feature of smaller index
+    is greater than the threshold. The correlation is fit once at the smallest threshold,
+    which finds all pairs needed for the larger thresholds.
+
+    Parameters
+    ----------
+    selection_method: SelectionMethod.Correlation
+        Correlation selection method, its threshold is ignored.
+    data: pd.DataFrame
+        Data of shape (n_samples, n_features) used for feature selection.
+    thresholds: List[float]
+        Thresholds of correlation to sweep.
+    seed: int, optional (default=Constants.default_seed)
+        The seed for random state, used in the approximate mode.
+
+    Returns
+    -------
+    Data frame with selection flag for each feature (index) and threshold (columns).
+    """
+
+    check_true(isinstance(selection_method, SelectionMethod.Correlation),
+               TypeError("Selection method must be correlation."))
+    check_true(thresholds is not None and len(thresholds) > 0, ValueError("Thresholds cannot be empty."))
+
+    # Validate each threshold
+    for threshold in thresholds:
+        selection_method._replace(threshold=threshold)._validate()
+
+    selector = Selective(selection_method._replace(threshold=min(thresholds)), seed)
+    selector.fit(data)
+
+    return _get_selected(selector, data, thresholds)
+
+
+def _get_selected(selector: Selective, data: pd.DataFrame, thresholds: List[float]) -> pd.DataFrame:
+    """
+    Returns the selection flag for each feature (index) and threshold (columns) of a fitted correlation selector.
+    """
+
+    # Features without correlation, e.g., non-numeric features, are kept
+    max_correlation = selector._imp.get_max_correlation().reindex(data.columns, fill_value=0)
+    is_selected = max_correlation.values[:, np.newaxis] <= np.asarray(thresholds)[np.newaxis, :]
+
+    return pd.DataFrame(is_selected.astype(int), index=data.columns, columns=thresholds)
+
+
 def calculate_statistics(scores: pd.DataFrame,
                          selected: pd.DataFrame,
                          columns: Optional[list] = None,
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: GNU GPLv3
+
+from typing import List, NoReturn, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
+
+from feature.base import _BaseSupervisedSelector
+
+
+class _Stability(_BaseSupervisedSelector):
+
+    def __init__(self, seed: int, selector, num_subsamples: int, n_jobs: int):
+        super().__init__(seed)
+
+        # Unfit selector of the underlying method, its method and seed make a fresh selector for each subsample
+        self.selector = selector
+        self.num_features = selector.selection_method.num_features  # this could be int or float
+        self.num_subsamples = num_subsamples
+        self.n_jobs = n_jobs
+
+    def fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # Random halves of the rows, without replacement
+        rng = np.random.default_rng(self.seed)
+        subsample_size = data.shape[0] // 2
+        subsamples = [np.sort(rng.choice(data.shape[0], subsample_size, replace=False))
+                      for _ in range(self.num_subsamples)]
+
+        # Data is passed once to each batch of subsamples as arrays, not data frames,
+        # which the process pool memory maps instead of copying to each process
+        values = data if sparse.issparse(data) else data.to_numpy()
+        columns = None if sparse.issparse(data) else data.columns
+        batches = np.array_split(np.arange(self.num_subsamples), min(effective_n_jobs(self.n_jobs),
+                                                                     self.num_subsamples))
+        output_list = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_subsamples)(self.selector, values, columns, labels.to_numpy(), labels.name,
+                                     [subsamples[i] for i in batch])
+            for batch in batches)
+        selected = np.concatenate([selected for selected, _ in output_list])
+        scores = np.concatenate([scores for _, scores in output_list])
+
+        # Set importance as selection probability
+        self.abs_scores = selected.mean(axis=0)
+        self.diagnostics = {"num_subsamples": self.num_subsamples, "subsample_size": subsample_size,
+                            "mean_scores": scores.mean(axis=0), "std_scores": scores.std(axis=0)}
+
+    def transform(self, data: Union[pd.DataFrame, sparse.spmatrix]) -> Union[pd.DataFrame, sparse.spmatrix]:
+
+        # Select top-k from data based on selection probabilities and num_features
+        return self.get_top_k(data, self.abs_scores)
+
+
+def _fit_subsamples(selector, values: Union[np.ndarray, sparse.spmatrix], columns: pd.Index,
+                    labels: np.ndarray, name: str, subsamples: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits a copy of the selector on the rows of each subsample.
+    Returns the selection flag and the score of each feature (columns) for each subsample (rows).
+
+    A feature is selected in a subsample when it is in the top-k with a non-zero score,
+    hence lasso selects no more than its non-zero coefficients.
+    """
+
+    selected = np.zeros((len(subsamples), values.shape[1]))
+    scores = np.zeros((len(subsamples), values.shape[1]))
+    for i, rows in enumerate(subsamples):
+
+        # Rows of the subsample are gathered once in the process from the shared data,
+        # and the frame is a view of the gathered rows with the names of features
+        subset = values[rows] if sparse.issparse(values) else pd.DataFrame(values[rows], columns=columns, copy=False)
+
+        # Fresh selector of the method for each subsample, instead of a copy of a selector object
+        subsample_selector = type(selector)(selector.selection_method, selector.seed)
+        subsample_selector.fit(subset, pd.Series(labels[rows], name=name))
+        scores[i] = subsample_selector.get_absolute_scores()
+
+        # Top-k as in transform of the selector
+        subsample_selector._imp.set_num_features(subset)
+        num_features = subsample_selector._imp.num_features
+        top_k = np.argpartition(scores[i], -num_features)[-num_features:]
+        selected[i, top_k] = scores[i, top_k] > 0
+
+    return selected, scores
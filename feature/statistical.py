@@ -3,21 +3,40 @@
 # SPDX-License-Identifier: GNU GPLv3
 
 from functools import partial
-from typing import NoReturn, Tuple
+from multiprocessing import cpu_count
+from typing import Dict, List, NoReturn, Optional, Tuple, Union
 
-# from minepy import MINE (dropped)
 import numpy as np
 import pandas as pd
-from sklearn.feature_selection import chi2, f_classif, f_regression, mutual_info_classif, mutual_info_regression
-from statsmodels.stats.outliers_influence import variance_inflation_factor
+from joblib import Parallel, delayed
+from scipy import sparse
+from scipy.special import digamma, xlogy
+from sklearn.feature_selection import chi2, f_classif, f_regression
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import scale
+from sklearn.utils import check_random_state
+from sklearn.utils.multiclass import check_classification_targets
+from sklearn.utils.validation import check_array, check_X_y
 
 from feature.base import _BaseSupervisedSelector, _BaseDispatcher
-from feature.utils import get_selector, Num, get_task_string
+from feature.utils import _RunningClassSums, _RunningCovariance, _to_dense, check_true, get_selector, Num, \
+    get_task_string
+
+# Exponent of the maximum grid size n^alpha of maximal information, same as minepy
+_MIC_ALPHA = 0.6
+
+# Maximum number of bins in each axis of maximal information grids
+_MIC_NUM_BINS = 64
+
+# Number of values in a batch of stacked targets, which bounds dense class indicators and permuted labels
+_BATCH_SIZE = 2 ** 22
 
 
 class _Statistical(_BaseSupervisedSelector, _BaseDispatcher):
 
-    def __init__(self, seed: int, num_features: Num, method: str):
+    def __init__(self, seed: int, num_features: Num, method: str, vif_threshold: Optional[Num], n_jobs: int,
+                 estimator: str = "knn", num_bins: int = 32, binning: str = "quantile",
+                 num_permutations: Optional[int] = None):
         super().__init__(seed)
 
         # Number or percentage of features to select
@@ -26,29 +45,63 @@ class _Statistical(_BaseSupervisedSelector, _BaseDispatcher):
         # Statistical method (anova, chi, mutual)
         self.method = method
 
+        # Stepwise elimination of VIF, if any, and the remaining features
+        self.vif_threshold = vif_threshold
+        self.keep_features = None
+
+        # Number of concurrent threads for mutual and maximal information
+        self.n_jobs = n_jobs
+
+        # Number of label permutations for p-values of the scores, if any
+        self.num_permutations = num_permutations
+        self.p_values = None
+
+        # Mutual information estimator (knn, binned) and the bins of the binned estimator
+        self.estimator = estimator
+        self.num_bins = num_bins
+        self.binning = binning
+
         # Statistical type (anova_regression vs. anova_classification)
         self.statistical_type = None
 
+        # Feature names and the sufficient statistics accumulated by partial fit, if any
+        self.columns = None
+        self.moments = None
+
         # Implementor top-k or top-percentile
         self.imp = None
 
+        # Mutual information from nearest neighbors or from joint histograms of binned data
+        if self.estimator == "binned":
+            mutual_info = partial(_binned_mutual_info, num_bins=self.num_bins, binning=self.binning,
+                                  n_jobs=self.n_jobs)
+        else:
+            mutual_info = partial(_mutual_info, random_state=self.seed, n_jobs=self.n_jobs)
+
         # Implementor factory
         self.factory = {"regression_anova": f_regression,
                         "regression_chi_square": None,
-                        "regression_mutual_info": partial(mutual_info_regression, random_state=self.seed),
-                        # "regression_maximal_info": MINE(), # dropped
+                        "regression_mutual_info": partial(mutual_info, discrete_target=False),
+                        "regression_maximal_info": partial(_maximal_info, discrete_target=False, n_jobs=self.n_jobs),
                         "classification_anova": f_classif,
                         "classification_chi_square": chi2,
-                        "classification_mutual_info": partial(mutual_info_classif, random_state=self.seed),
-                        # "classification_maximal_info": MINE(), # dropped
-                        "unsupervised_variance_inflation": variance_inflation_factor}
+                        "classification_mutual_info": partial(mutual_info, discrete_target=True),
+                        "classification_maximal_info": partial(_maximal_info, discrete_target=True,
+                                                               n_jobs=self.n_jobs),
+                        "unsupervised_variance_inflation": _variance_inflation_factors}
 
     def get_model_args(self, selection_method) -> Tuple:
 
         # Pack model argument
         return selection_method.method
 
-    def dispatch_model(self, labels: pd.Series, *args):
+    def dispatch_model(self, labels: Union[pd.Series, pd.DataFrame], *args):
+
+        # Multiple targets are scored together in fit, check the task of each target
+        if isinstance(labels, pd.DataFrame):
+            for target in labels.columns:
+                self.dispatch_model(labels[target], *args)
+            return
 
         # Unpack model argument
         method = args[0]
@@ -62,26 +115,47 @@ class _Statistical(_BaseSupervisedSelector, _BaseDispatcher):
         # Check scoring compatibility with task
         if score_func is None:
             raise TypeError(method + " cannot be used for task: " + get_task_string(labels))
-        elif method == "variance_inflation": # or isinstance(score_func, MINE) (dropped)
+        elif method == "variance_inflation":
             self.imp = score_func
         else:
             # Set sklearn model selector based on scoring function
             self.imp = get_selector(score_func, self.num_features)
 
-    def fit(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
+    def fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: Union[pd.Series, pd.DataFrame]) -> NoReturn:
 
         # Calculate absolute scores depending on the method
-
-        # NOTE: mine is dropped
-        # if isinstance(self.imp, MINE):
-        #     self.abs_scores = []
-        #     for col in data.columns:
-        #         self.imp.compute_score(data[col], labels)
-        #         score = self.imp.mic()
-        #         self.abs_scores.append(score)
-        if self.method == "variance_inflation":
+        self.moments = None
+        self.p_values = None
+        if self.method == "variance_inflation" and self.vif_threshold is None:
             # VIF is unsupervised, regression between data and each feature
-            self.abs_scores = np.array([variance_inflation_factor(data.values, i) for i in range(data.shape[1])])
+            # All regressions are solved at once from the inverse of the Gram matrix
+            self.abs_scores = _variance_inflation_factors(data.values)
+        elif isinstance(labels, pd.DataFrame):
+            # Scores of each target against each feature, features are converted and centered once for all targets
+            columns = pd.RangeIndex(data.shape[1]) if sparse.issparse(data) else data.columns
+            # Features and targets are validated once, as check_X_y does for a single target
+            values = check_array(_as_float(data), accept_sparse="csr")
+            check_array(labels.values, dtype=None)
+            is_classification = np.array([get_task_string(labels[target]) == "classification_"
+                                          for target in labels.columns])
+            if self.method == "chi_square":
+                check_true(not np.any((values.data if sparse.issparse(values) else values) < 0),
+                           ValueError("Input X must be non-negative."))
+            scores = _multi_target_scores(values, labels.values, is_classification, self.method)
+            self.abs_scores = pd.DataFrame(scores, index=labels.columns, columns=columns)
+
+            if self.num_permutations is not None:
+                p_values = [_permutation_p_values(values, labels[target].values, is_target_classification,
+                                                  self.method, self.num_permutations, self.seed)
+                            for target, is_target_classification in zip(labels.columns, is_classification)]
+                self.p_values = pd.DataFrame(p_values, index=labels.columns, columns=columns)
+        elif self.method == "variance_inflation":
+            # Eliminate the feature with largest VIF one at a time, num_features is the minimum to keep
+            self.set_num_features(data)
+            self.abs_scores, eliminated, trace = _stepwise_variance_inflation(data.values, self.vif_threshold,
+                                                                              self.num_features)
+            self.keep_features = list(data.columns.delete(eliminated))
+            self.diagnostics = {"elimination_order": list(data.columns[eliminated]), "vif_trace": trace}
         else:
             # sklearn selector model
             self.imp.fit(X=data, y=labels)
@@ -89,11 +163,677 @@ class _Statistical(_BaseSupervisedSelector, _BaseDispatcher):
             # Set importance as test scores
             self.abs_scores = self.imp.scores_
 
-    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+            # Significance of the scores against scores of permuted labels
+            if self.num_permutations is not None:
+                self.p_values = _permutation_p_values(_as_float(data), np.asarray(labels),
+                                                      get_task_string(labels) == "classification_", self.method,
+                                                      self.num_permutations, self.seed)
+
+    def partial_fit(self, data: Union[pd.DataFrame, sparse.spmatrix], labels: pd.Series) -> NoReturn:
+
+        # ANOVA and chi-square only need sufficient statistics of each chunk, the task is set by the first chunk
+        check_true(self.method in ["anova", "chi_square"],
+                   ValueError("Partial fit is only supported for anova and chi_square."))
+        check_true(isinstance(labels, pd.Series), ValueError("Partial fit is only supported for a single target."))
+
+        # Each chunk is validated as in fit, a missing value would leave every later score missing
+        check_X_y(data, labels, accept_sparse="csr")
+        if self.method == "chi_square":
+            values = data.data if sparse.issparse(data) else data.values
+            check_true(not np.any(values < 0), ValueError("Input X must be non-negative."))
+
+        # Sparse data has no feature names, features are named by position
+        columns = pd.RangeIndex(data.shape[1]) if sparse.issparse(data) else data.columns
+
+        if self.moments is None:
+            self.statistical_type = get_task_string(labels)
+            self.moments = _RunningClassSums() if self.statistical_type == "classification_" \
+                else _RunningCovariance()
+            self.columns = columns
+        else:
+            check_true(columns.equals(self.columns),
+                       ValueError("Columns of each chunk must be the same as the first chunk."))
+
+        # Accumulate statistics, scores are found on demand, labels of past chunks cannot be permuted
+        self.moments.update(data if sparse.issparse(data) else data.values, np.asarray(labels))
+        self.abs_scores, self.p_values = None, None
+
+    def merge(self, other: '_Statistical') -> NoReturn:
+
+        # Combine statistics of another shard of rows
+        check_true(self.moments is not None and other.moments is not None,
+                   ValueError("Only selectors fit with partial fit can be merged."))
+        check_true(other.statistical_type == self.statistical_type,
+                   ValueError("Only selectors of the same task can be merged."))
+        check_true(other.columns.equals(self.columns), ValueError("Columns of merged selectors must be the same."))
+        self.moments.merge(other.moments)
+        self.abs_scores = None
+
+    def finalize(self) -> NoReturn:
+
+        # Nothing to do after fit or once statistics are finalized
+        if self.moments is None or self.abs_scores is not None:
+            return
+
+        # Set importance as test scores, same as the sklearn scoring functions
+        if self.statistical_type == "regression_":
+            self.abs_scores = _f_regression_moments(self.moments)
+        elif self.method == "anova":
+            self.abs_scores = _f_classif_sums(self.moments.count, self.moments.sums,
+                                              self.moments.squares.sum(axis=0))
+        else:
+            self.abs_scores = _chi2_sums(self.moments.count, self.moments.sums)
+
+    def transform(self, data: Union[pd.DataFrame, sparse.spmatrix]) \
+            -> Union[pd.DataFrame, sparse.spmatrix, Dict[str, Union[pd.DataFrame, sparse.spmatrix]]]:
 
         # Select top-k from data based on abs_scores and num_features
-        if self.method == "variance_inflation":
+        if isinstance(self.abs_scores, pd.DataFrame):
+            # Top-k of each target
+            return {target: self.get_top_k(data, scores.values) for target, scores in self.abs_scores.iterrows()}
+        elif self.method == "variance_inflation" and self.vif_threshold is not None:
+            # Features remaining after stepwise elimination
+            return data[self.keep_features].copy()
+        elif self.method == "variance_inflation":
             # Smaller is better for VIF, negate the scores
             return self.get_top_k(data, -1*self.abs_scores)
         else:
             return self.get_top_k(data, self.abs_scores)
+
+
+def _as_float(data: Union[pd.DataFrame, sparse.spmatrix]) -> Union[np.ndarray, sparse.csr_matrix]:
+    # Features as float array, or float csr matrix if sparse, converted once for all targets
+    return sparse.csr_matrix(data, dtype=np.float64) if sparse.issparse(data) else np.asarray(data, dtype=np.float64)
+
+
+def _multi_target_scores(values: Union[np.ndarray, sparse.csr_matrix], targets: np.ndarray,
+                         is_classification: np.ndarray, method: str) -> np.ndarray:
+    """
+    Returns the score of each target (rows) against each feature (columns) for anova or chi_square.
+
+    Class sums of all classification targets are a single product with the stacked class indicators of the targets.
+    Co-moments of all regression targets are a single product with the centered target matrix.
+    """
+
+    num_rows = values.shape[0]
+    scores = np.empty((targets.shape[1], values.shape[1]))
+
+    if is_classification.any():
+        # Class indicators of each target are stacked, the classes of each target are a range of rows
+        codes, offsets = [], [0]
+        for target in np.flatnonzero(is_classification):
+            classes, code = np.unique(targets[:, target], return_inverse=True)
+            codes.append(code + offsets[-1])
+            offsets.append(offsets[-1] + len(classes))
+        codes = np.concatenate(codes)
+        rows = np.tile(np.arange(num_rows), len(offsets) - 1)
+        indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, rows)), shape=(offsets[-1], num_rows))
+        count = np.bincount(codes, minlength=offsets[-1])
+
+        # Small indicators of dense features are faster as a dense product
+        if not sparse.issparse(values) and offsets[-1] * num_rows <= _BATCH_SIZE:
+            indicator = indicator.toarray()
+        sums = _to_dense(indicator @ values)
+
+        # Sum of squares of all rows does not depend on the classes
+        if method == "anova":
+            squared = values.multiply(values) if sparse.issparse(values) else np.square(values)
+            sum_of_squares = _to_dense(squared.sum(axis=0)).ravel()
+
+        for index, start, end in zip(np.flatnonzero(is_classification), offsets[:-1], offsets[1:]):
+            if method == "anova":
+                scores[index] = _f_classif_sums(count[start:end], sums[start:end], sum_of_squares)
+            else:
+                scores[index] = _chi2_sums(count[start:end], sums[start:end])
+
+    if not is_classification.all():
+        moments = _RunningCovariance()
+        moments.update(values, targets[:, ~is_classification].astype(np.float64))
+        scores[~is_classification] = _f_regression_moments(moments)
+
+    return scores
+
+
+def _permutation_p_values(values: Union[np.ndarray, sparse.csr_matrix], labels: np.ndarray, is_classification: bool,
+                          method: str, num_permutations: int, seed: int) -> np.ndarray:
+    """
+    Returns the permutation p-value of the score of each feature, (1 + #null scores >= score) / (1 + permutations).
+
+    Null scores of a batch of permutations are the scores of multiple targets,
+    i.e., a single product of the features with the stacked permuted labels, instead of a fit per permutation.
+    Batches bound the memory of the permuted labels and the null scores.
+    """
+
+    # Class codes are permuted instead of labels
+    if is_classification:
+        _, labels = np.unique(labels, return_inverse=True)
+    else:
+        labels = np.asarray(labels, dtype=np.float64)
+    observed = _multi_target_scores(values, labels[:, None], np.array([is_classification]), method)[0]
+
+    num_classes = labels.max() + 1 if is_classification else 1
+    batch_size = max(1, _BATCH_SIZE // (num_classes * max(len(labels), values.shape[1])))
+    rng = np.random.default_rng(seed)
+    num_greater = np.zeros(values.shape[1])
+    for start in range(0, num_permutations, batch_size):
+        num_batch = min(batch_size, num_permutations - start)
+        permuted = rng.permuted(np.tile(labels[:, None], (1, num_batch)), axis=0)
+        null = _multi_target_scores(values, permuted, np.full(num_batch, is_classification), method)
+        num_greater += np.sum(null >= observed, axis=0)
+
+    # Undefined scores, e.g., of constant features, have undefined p-values
+    p_values = (1 + num_greater) / (1 + num_permutations)
+    p_values[np.isnan(observed)] = np.nan
+    return p_values
+
+
+def _f_classif_sums(count: np.ndarray, sums: np.ndarray, sum_of_squares: np.ndarray) -> np.ndarray:
+    """
+    Returns the ANOVA F-value of each column from the count and sums of each class and the sum of squares of all rows,
+    with the same formulas as sklearn f_classif.
+    """
+
+    num_rows, num_classes = np.sum(count), len(count)
+    square_of_sums = np.square(sums.sum(axis=0))
+    total = sum_of_squares - square_of_sums / num_rows
+    between = np.sum(np.square(sums) / count[:, None], axis=0) - square_of_sums / num_rows
+    within = total - between
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (between / (num_classes - 1)) / (within / (num_rows - num_classes))
+
+
+def _chi2_sums(count: np.ndarray, sums: np.ndarray) -> np.ndarray:
+    """
+    Returns the chi-square statistic of each non-negative column from the count and sums of each class,
+    with the same formulas as sklearn chi2.
+    """
+
+    # Observed sums of each class against the sums expected from the frequency of each class
+    expected = np.outer(count / np.sum(count), sums.sum(axis=0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sum(np.square(sums - expected) / expected, axis=0)
+
+
+def _f_regression_moments(moments: _RunningCovariance) -> np.ndarray:
+    """
+    Returns the F-value of a linear regression of the target, or each target, on each column from their co-moments,
+    with the same formulas as sklearn f_regression.
+    Perfect correlations have the largest finite value, constant columns or target have zero.
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = moments.co_moment / np.sqrt(np.maximum(moments.m2, 0)) / np.sqrt(moments.target_m2)[..., None]
+        correlation[np.isnan(correlation)] = 0
+        squared = np.square(correlation)
+        f_statistic = squared / (1 - squared) * (moments.count - 2)
+
+    f_statistic[np.isinf(f_statistic)] = np.finfo(f_statistic.dtype).max
+    f_statistic[np.isnan(f_statistic)] = 0
+    return f_statistic
+
+
+def _variance_inflation_factors(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the variance inflation factor of each column, as in statsmodels variance_inflation_factor.
+
+    The VIF of a column is 1 / (1 - R^2) of its regression on the other columns, without an added intercept.
+    The residual sum of squares of column i is 1 / inv(X'X)_ii, hence VIF_i = (x_i'x_i) * inv(X'X)_ii,
+    which is the diagonal of the inverse of the Gram matrix scaled to unit diagonal.
+    All regressions cost a single p x p inversion instead of p least squares fits.
+    """
+
+    gram, is_constant, centered = _scaled_gram(values)
+    _, vif = _inverse_diagonal(gram)
+
+    return _center_intercept(vif, is_constant, centered)
+
+
+def _stepwise_variance_inflation(values: np.ndarray, threshold: float, num_features: int) \
+        -> Tuple[np.ndarray, List[int], List[float]]:
+    """
+    Returns the VIF of each column when it is eliminated, or at the end if kept,
+    the eliminated columns in order, and the largest VIF before each elimination and at the end.
+
+    The column with the largest VIF, the later one on ties, is eliminated until
+    all VIF are less than the threshold or num_features columns remain.
+    Removing column k from the inverse Gram matrix is a rank one downdate
+    A - A[:, k] A[k, :] / A[k, k], restricted to the remaining columns, instead of a new inversion.
+    """
+
+    gram, is_constant, centered = _scaled_gram(values)
+    scores = np.empty(gram.shape[0])
+    active = np.arange(gram.shape[0])
+    eliminated, trace = [], []
+
+    inverse = None
+    while True:
+
+        # Invert again only while singular, otherwise downdate
+        if inverse is None:
+            inverse, vif = _inverse_diagonal(gram[np.ix_(active, active)])
+        else:
+            vif = np.diag(inverse).copy()
+        vif = _center_intercept(vif, is_constant[active], centered[active])
+        scores[active] = vif
+
+        worst = len(vif) - 1 - np.argmax(vif[::-1])
+        trace.append(vif[worst])
+        if vif[worst] < threshold or len(active) <= num_features:
+            break
+
+        if inverse is not None:
+            column = inverse[:, worst]
+            inverse = inverse - np.outer(column, column) / column[worst]
+            inverse = np.delete(np.delete(inverse, worst, axis=0), worst, axis=1)
+        eliminated.append(active[worst])
+        active = np.delete(active, worst)
+
+    return scores, eliminated, trace
+
+
+def _scaled_gram(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the Gram matrix scaled to unit diagonal, i.e., the uncentered correlation matrix,
+    whether each column is a non-zero constant,
+    and the ratio of centered to uncentered sum of squares of each column.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    gram = values.T @ values
+    norms = np.sqrt(np.diag(gram))
+    norms[norms == 0] = 1
+    gram = gram / np.outer(norms, norms)
+
+    is_constant = (np.ptp(values, axis=0) == 0) & (values[0] != 0) if len(values) else np.zeros(len(gram), bool)
+    centered = np.square(values - values.mean(axis=0)).sum(axis=0) / np.square(norms)
+
+    return gram, is_constant, centered
+
+
+def _inverse_diagonal(gram: np.ndarray) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Returns the inverse of a scaled Gram matrix, None when singular, and the diagonal of its inverse.
+
+    When singular, the pseudo-inverse gives the diagonal of columns in its range.
+    Columns that are exact linear combinations of others have infinite diagonal, i.e., VIF.
+    """
+
+    try:
+        # Positive definite, regular inverse
+        np.linalg.cholesky(gram)
+        inverse = np.linalg.inv(gram)
+        return inverse, np.diag(inverse).copy()
+    except np.linalg.LinAlgError:
+        # Pseudo-inverse from the eigen decomposition
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        is_null = eigenvalues <= eigenvalues.max(initial=0) * len(gram) * np.finfo(np.float64).eps
+        squared = np.square(eigenvectors)
+        diagonal = squared[:, ~is_null] @ (1 / eigenvalues[~is_null])
+        diagonal[squared[:, is_null].sum(axis=1) > np.sqrt(np.finfo(np.float64).eps)] = np.inf
+        return None, diagonal
+
+
+def _center_intercept(vif: np.ndarray, is_constant: np.ndarray, centered: np.ndarray) -> np.ndarray:
+    """
+    Returns VIF with centered R^2 for columns when another column is constant, i.e., an intercept, as in statsmodels.
+    """
+    has_intercept = is_constant.sum() - is_constant > 0
+    return np.where(has_intercept, vif * centered, vif)
+
+
+def _mutual_info(data: np.ndarray, labels: np.ndarray, discrete_target: bool, random_state: int, n_jobs: int,
+                 n_neighbors: int = 3) -> np.ndarray:
+    """
+    Returns the mutual information between each continuous feature and the labels,
+    as in sklearn mutual_info_regression and mutual_info_classif.
+
+    Scaling and noise are drawn exactly as in sklearn, in the same order, hence the same scores under the same seed.
+    Structures of the labels are built once and shared by all features:
+    the sorted labels for regression, and the groups of each class for classification.
+    Features are scored concurrently in blocks.
+    """
+
+    data, labels = check_X_y(data, labels, y_numeric=not discrete_target)
+    if discrete_target:
+        check_classification_targets(labels)
+    num_rows, num_columns = data.shape
+
+    # Scale and add small noise to break ties, same as sklearn
+    rng = check_random_state(random_state)
+    data = data.copy()
+    if not discrete_target:
+        data[:, :] = scale(data, with_mean=False, copy=False)
+    data = data.astype(np.float64, copy=False)
+    means = np.maximum(1, np.mean(np.abs(data), axis=0))
+    data += 1e-10 * means * rng.standard_normal(size=(num_rows, num_columns))
+
+    if discrete_target:
+        score_block = partial(_mutual_info_classes, classes=_LabelGroups(labels, n_neighbors))
+    else:
+        labels = scale(labels, with_mean=False)
+        labels += 1e-10 * np.maximum(1, np.mean(np.abs(labels))) * rng.standard_normal(size=num_rows)
+        labels = labels.reshape((-1, 1))
+        score_block = partial(_mutual_info_continuous, labels=labels, sorted_labels=np.sort(labels[:, 0]),
+                              n_neighbors=n_neighbors)
+
+    return _score_blocks(score_block, data, n_jobs)
+
+
+def _score_blocks(score_block, data: np.ndarray, n_jobs: int) -> np.ndarray:
+    """
+    Returns the scores of all columns, scored concurrently in blocks of columns by the given function.
+    """
+
+    # Blocks of features balance the work and the scheduling overhead
+    num_columns = data.shape[1]
+    num_blocks = min(num_columns, 4 * (n_jobs if n_jobs > 0 else max(1, cpu_count() + 1 + n_jobs)))
+    blocks = np.array_split(np.arange(num_columns), max(1, num_blocks))
+    scores = Parallel(n_jobs=n_jobs, prefer="threads")(delayed(score_block)(data[:, block]) for block in blocks)
+
+    return np.concatenate(scores)
+
+
+class _LabelGroups:
+    """
+    Rows, size and number of neighbors of each class with more than one row, shared by all features.
+    """
+
+    def __init__(self, labels: np.ndarray, n_neighbors: int):
+        num_rows = len(labels)
+        self.masks, self.num_neighbors = [], []
+        label_counts = np.empty(num_rows)
+        k_all = np.empty(num_rows)
+        for label in np.unique(labels):
+            mask = labels == label
+            count = np.sum(mask)
+            if count > 1:
+                k = min(n_neighbors, count - 1)
+                self.masks.append(mask)
+                self.num_neighbors.append(k)
+                k_all[mask] = k
+            label_counts[mask] = count
+
+        # Rows of classes with a single row are skipped
+        self.is_kept = label_counts > 1
+        self.num_kept = np.sum(self.is_kept)
+        self.neighbor_term = np.mean(digamma(k_all[self.is_kept]))
+        self.count_term = np.mean(digamma(label_counts[self.is_kept]))
+
+
+def _mutual_info_classes(data: np.ndarray, classes: _LabelGroups) -> np.ndarray:
+    """
+    Returns the mutual information between each continuous column and discrete labels, as in Ross (2014).
+    """
+
+    scores = np.empty(data.shape[1])
+    for i in range(data.shape[1]):
+        column = data[:, i].reshape((-1, 1))
+
+        # Distance to the k-th neighbor within the same class
+        radius = np.empty(len(column))
+        for mask, k in zip(classes.masks, classes.num_neighbors):
+            distances = NearestNeighbors(n_neighbors=k).fit(column[mask]).kneighbors()[0]
+            radius[mask] = np.nextafter(distances[:, -1], 0)
+
+        # Number of rows of any class within the radius
+        column, radius = column[classes.is_kept, 0], radius[classes.is_kept]
+        counts = _count_within(np.sort(column), column, radius, squared=True) - 1.0
+
+        mi = digamma(classes.num_kept) + classes.neighbor_term - classes.count_term - np.mean(digamma(counts + 1))
+        scores[i] = max(0, mi)
+
+    return scores
+
+
+def _mutual_info_continuous(data: np.ndarray, labels: np.ndarray, sorted_labels: np.ndarray, n_neighbors: int) \
+        -> np.ndarray:
+    """
+    Returns the mutual information between each continuous column and continuous labels, as in Kraskov et al. (2004).
+    """
+
+    num_rows = len(labels)
+    scores = np.empty(data.shape[1])
+    for i in range(data.shape[1]):
+        column = data[:, i].reshape((-1, 1))
+
+        # Distance to the k-th neighbor in the joint space
+        joint = np.hstack((column, labels))
+        distances = NearestNeighbors(metric="chebyshev", n_neighbors=n_neighbors).fit(joint).kneighbors()[0]
+        radius = np.nextafter(distances[:, -1], 0)
+
+        # Number of rows within the radius in each marginal space
+        column_counts = _count_within(np.sort(column[:, 0]), column[:, 0], radius, squared=False)
+        label_counts = _count_within(sorted_labels, labels[:, 0], radius, squared=False)
+
+        mi = (digamma(num_rows) + digamma(n_neighbors)
+              - np.mean(digamma(column_counts.astype(np.float64)))
+              - np.mean(digamma(label_counts.astype(np.float64))))
+        scores[i] = max(0, mi)
+
+    return scores
+
+
+def _count_within(sorted_values: np.ndarray, values: np.ndarray, radius: np.ndarray, squared: bool) -> np.ndarray:
+    """
+    Returns the number of sorted values within the radius of each value, including itself.
+
+    In one dimension, the neighbors within a radius are a window of the sorted values found by binary search,
+    instead of a query of a KD-tree per value.
+    The window is then corrected with the distance of the tree, |s - v| <= r for chebyshev,
+    or (s - v)^2 <= r^2 for euclidean, hence the same counts despite rounding in v - r and v + r.
+    """
+
+    def is_within(index):
+        difference = sorted_values[np.clip(index, 0, len(sorted_values) - 1)] - values
+        is_close = difference * difference <= radius * radius if squared else np.abs(difference) <= radius
+        return is_close & (index >= 0) & (index < len(sorted_values))
+
+    lower = np.searchsorted(sorted_values, values - radius, side="left")
+    upper = np.searchsorted(sorted_values, values + radius, side="right")
+
+    # Each value is within its own window, grow or shrink the window until its ends are exact
+    for _ in range(len(sorted_values)):
+        grow_lower, shrink_lower = is_within(lower - 1), ~is_within(lower)
+        grow_upper, shrink_upper = is_within(upper), ~is_within(upper - 1)
+        if not (grow_lower.any() or shrink_lower.any() or grow_upper.any() or shrink_upper.any()):
+            break
+        lower += shrink_lower.astype(int) - grow_lower
+        upper += grow_upper.astype(int) - shrink_upper
+
+    return upper - lower
+
+
+def _binned_mutual_info(data: np.ndarray, labels: np.ndarray, discrete_target: bool, num_bins: int, binning: str,
+                        n_jobs: int) -> np.ndarray:
+    """
+    Returns the mutual information between each feature and the labels, from the joint histogram of binned values.
+
+    Each column is quantized once into at most num_bins quantile or equal-width bins, stored as uint8 or uint16.
+    Continuous labels are binned the same way, discrete labels are used as is.
+    The joint histogram of a column and the labels is a single bincount over n rows,
+    hence linear time in the number of rows and features, instead of nearest neighbor queries.
+    The plug-in estimate is biased upwards with the number of bins, hence the Miller-Madow correction,
+    so that independent features score close to zero regardless of their number of distinct values.
+    """
+
+    data, labels = check_X_y(data, labels, y_numeric=not discrete_target)
+    if discrete_target:
+        check_classification_targets(labels)
+        _, labels = np.unique(labels, return_inverse=True)
+    else:
+        labels = _quantize(labels, num_bins, binning)
+
+    # Distribution of the labels is shared by all features
+    num_labels = int(labels.max()) + 1
+    label_probs = np.bincount(labels, minlength=num_labels) / len(labels)
+
+    score_block = partial(_binned_mutual_info_block, labels=labels.astype(np.intp), num_labels=num_labels,
+                          label_probs=label_probs, num_bins=num_bins, binning=binning)
+    return _score_blocks(score_block, data, n_jobs)
+
+
+def _binned_mutual_info_block(data: np.ndarray, labels: np.ndarray, num_labels: int, label_probs: np.ndarray,
+                              num_bins: int, binning: str) -> np.ndarray:
+    """
+    Returns the mutual information between each column and binned labels, in nats.
+    """
+
+    scores = np.empty(data.shape[1])
+    for i in range(data.shape[1]):
+        bins = _quantize(data[:, i], num_bins, binning)
+
+        # Joint distribution of the bins of the column and the labels
+        joint = np.bincount(bins.astype(np.intp) * num_labels + labels, minlength=num_bins * num_labels)
+        joint = joint.reshape((num_bins, num_labels)) / len(labels)
+        column_probs = joint.sum(axis=1)
+
+        # Sum of p(x, y) log(p(x, y) / (p(x) p(y))) over non-empty cells
+        rows, cols = np.nonzero(joint)
+        probs = joint[rows, cols]
+        mi = np.sum(probs * np.log(probs / (column_probs[rows] * label_probs[cols])))
+
+        # Miller-Madow correction of the bias from the number of non-empty cells
+        mi -= (len(probs) - np.count_nonzero(column_probs) - np.count_nonzero(label_probs) + 1) / (2 * len(labels))
+        scores[i] = max(0, mi)
+
+    return scores
+
+
+def _quantize(values: np.ndarray, num_bins: int, binning: str) -> np.ndarray:
+    """
+    Returns the bin of each value, among num_bins quantile or equal-width (uniform) bins.
+
+    Quantile bins with equal edges, due to ties, are merged, hence constant values have a single bin.
+    """
+
+    dtype = np.uint8 if num_bins <= 256 else np.uint16
+    if binning == "quantile":
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, num_bins + 1)[1:-1]))
+        return np.searchsorted(edges, values, side="right").astype(dtype)
+
+    low, high = values.min(), values.max()
+    width = (high - low) / num_bins if high > low else 1
+    return np.clip((values - low) / width, 0, num_bins - 1).astype(dtype)
+
+
+def _maximal_info(data: np.ndarray, labels: np.ndarray, discrete_target: bool, n_jobs: int) -> np.ndarray:
+    """
+    Returns the approximate maximal information coefficient (MIC) of Reshef et al. (2011)
+    between each feature and the labels.
+
+    MIC is the largest mutual information over grids of nx by ny cells, with nx * ny <= n^0.6,
+    normalized by log(min(nx, ny)), hence between 0 and 1.
+    Instead of optimizing the partition of each axis as in minepy,
+    the search is restricted to (near) equal frequency partitions of each axis.
+    Each axis is binned once into fine quantile bins, ties in the same bin,
+    and the coarser partitions are merges of consecutive fine bins.
+    The counts of any grid are then differences of the cumulative joint histogram,
+    without another pass over the rows.
+    Partitions of the labels are shared by all features, which are scored concurrently in blocks.
+    Classes have no order, hence discrete labels are not merged, the only partition of the labels is the classes.
+    """
+
+    data, labels = check_X_y(data, labels, y_numeric=not discrete_target)
+    num_rows = len(labels)
+    max_cells = max(4, int(num_rows ** _MIC_ALPHA))
+    num_bins = max(2, min(_MIC_NUM_BINS, max_cells // 2))
+
+    if discrete_target:
+        check_classification_targets(labels)
+        _, labels = np.unique(labels, return_inverse=True)
+        num_labels = int(labels.max()) + 1
+    else:
+        labels = _quantize(labels, num_bins, "quantile")
+        num_labels = num_bins
+    labels = labels.astype(np.intp)
+    label_partitions = _MaximalInfoPartitions(np.bincount(labels, minlength=num_labels), max_cells,
+                                              is_ordered=not discrete_target)
+
+    score_block = partial(_maximal_info_block, labels=labels, num_labels=num_labels,
+                          label_partitions=label_partitions, num_bins=num_bins, max_cells=max_cells)
+    return _score_blocks(score_block, data, n_jobs)
+
+
+class _MaximalInfoPartitions:
+    """
+    Partitions of an axis into 2, 3, ... parts, as boundaries of consecutive fine bins,
+    concatenated for all number of parts, and the sum of c log(c) of the counts of each partition.
+    Bins that are not ordered, such as classes, are never merged, each bin is a part of the only partition.
+    """
+
+    def __init__(self, counts: np.ndarray, max_cells: int, is_ordered: bool = True):
+
+        # Boundaries with (near) equal number of rows on each side, duplicates from large bins are merged
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        if is_ordered:
+            candidates = []
+            for num_parts in range(2, min(len(counts), max_cells // 2) + 1):
+                quantiles = np.arange(1, num_parts) * cumulative[-1] / num_parts
+                inner = np.searchsorted(cumulative, quantiles, side="left")
+                candidates.append((num_parts, np.unique(np.concatenate(([0], inner, [len(counts)])))))
+        else:
+            candidates = [(len(counts), np.arange(len(counts) + 1))]
+
+        self.num_parts, self.bounds, self.starts, self.sizes = [], [], [], []
+        for num_parts, bounds in candidates:
+            if len(bounds) < 3:
+                continue
+            self.num_parts.append(num_parts)
+            self.starts.append(sum(len(b) for b in self.bounds))
+            self.sizes.append(len(bounds) - 1)
+            self.bounds.append(bounds)
+
+        self.num_parts = np.array(self.num_parts, dtype=int)
+        self.starts = np.array(self.starts, dtype=np.intp)
+        self.sizes = np.array(self.sizes, dtype=int)
+        self.entropy_terms = np.array([np.sum(xlogy(np.diff(cumulative[b]), np.diff(cumulative[b])))
+                                       for b in self.bounds])
+        self.bounds = np.concatenate(self.bounds) if self.bounds else np.empty(0, dtype=np.intp)
+
+
+def _maximal_info_block(data: np.ndarray, labels: np.ndarray, num_labels: int,
+                        label_partitions: _MaximalInfoPartitions, num_bins: int, max_cells: int) -> np.ndarray:
+    """
+    Returns the approximate maximal information coefficient between each column and the binned labels, or classes.
+    """
+
+    num_rows = len(labels)
+    scores = np.zeros(data.shape[1])
+    for i in range(data.shape[1]):
+        bins = _quantize(data[:, i], num_bins, "quantile").astype(np.intp)
+
+        # Cumulative joint histogram, the counts of a grid are its differences at the boundaries
+        joint = np.bincount(bins * num_labels + labels, minlength=num_bins * num_labels)
+        joint = joint.reshape((num_bins, num_labels))
+        cumulative = np.zeros((num_bins + 1, num_labels + 1))
+        cumulative[1:, 1:] = joint.cumsum(axis=0).cumsum(axis=1)
+
+        partitions = _MaximalInfoPartitions(joint.sum(axis=1), max_cells)
+        for num_parts, start, size, entropy_term in zip(partitions.num_parts, partitions.starts, partitions.sizes,
+                                                        partitions.entropy_terms):
+
+            # Label partitions with at most max_cells cells
+            num_label_partitions = np.searchsorted(label_partitions.num_parts, max_cells // num_parts, side="right")
+            if num_label_partitions == 0:
+                continue
+            end = label_partitions.starts[num_label_partitions - 1] + label_partitions.sizes[num_label_partitions - 1]
+
+            # Cumulative counts of each part along the label axis, at the boundaries of all label partitions
+            bounds = partitions.bounds[start:start + size + 1]
+            strips = np.diff(cumulative[bounds][:, label_partitions.bounds[:end + 1]], axis=0)
+            cells = np.diff(strips, axis=1)
+
+            # Differences across two label partitions are not cells
+            cells[:, label_partitions.starts[1:num_label_partitions] - 1] = 0
+            joint_terms = np.add.reduceat(xlogy(cells, cells).sum(axis=0),
+                                          label_partitions.starts[:num_label_partitions])
+
+            # Mutual information of each grid, normalized by its smaller side
+            mi = np.log(num_rows) + (joint_terms - entropy_term
+                                     - label_partitions.entropy_terms[:num_label_partitions]) / num_rows
+            normalized = mi / np.log(np.minimum(size, label_partitions.sizes[:num_label_partitions]))
+            scores[i] = max(scores[i], np.max(normalized))
+
+    return np.clip(scores, 0, 1)
@@ -2,24 +2,43 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-from typing import NoReturn, Tuple
+from typing import List, NoReturn, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from catboost import CatBoost
-from sklearn.base import ClassifierMixin, RegressorMixin
+from joblib import Parallel, delayed, effective_n_jobs
+from lightgbm import LGBMModel
+from scipy.stats import spearmanr
+from sklearn.base import ClassifierMixin, RegressorMixin, clone
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from xgboost import XGBModel
 
 from feature.base import _BaseSupervisedSelector, _BaseDispatcher
-from feature.utils import Num, get_task_string
+from feature.utils import Num, get_task_string, is_classification
+
+# Importances are stable when the top-k is unchanged and the rank correlation with the previous batch is
+# at least the minimum, for a number of consecutive batches
+_MIN_RANK_CORRELATION = 0.95
+_PATIENCE = 2
+
+# Number of permutations of each feature, same as sklearn, and number of float32 values of permuted data
+# predicted at once by all jobs
+_NUM_REPEATS = 5
+_BUFFER_SIZE = 2 ** 24
 
 
 class _TreeBased(_BaseSupervisedSelector, _BaseDispatcher):
 
-    def __init__(self, seed: int, num_features: Num, estimator):
+    def __init__(self, seed: int, num_features: Num, estimator, batch_size: Optional[int] = None,
+                 importance: str = "impurity", n_jobs: int = 1):
         super().__init__(seed)
 
         self.num_features = num_features    # this could be int or float
         self.estimator = estimator
+        self.batch_size = batch_size
+        self.importance = importance
+        self.n_jobs = n_jobs
 
         # Implementor is decided when data becomes available in fit()
         self.imp = None
@@ -67,13 +86,138 @@ class _TreeBased(_BaseSupervisedSelector, _BaseDispatcher):
 
     def fit(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
 
-        # Fit tree model
-        self.imp.fit(X=data, y=labels)
-
-        # Set importance as feature importances
-        self.abs_scores = self.imp.feature_importances_
+        # Grow the trees in batches until importances are stable
+        if self.batch_size is not None:
+            self._fit_batches(data, labels)
+        else:
+            # Fit tree model
+            self.imp.fit(X=data, y=labels)
+
+            # Set importance as feature importances
+            self.abs_scores = self.imp.feature_importances_
+
+        # Replace importance with the decrease of score when each feature is permuted
+        if self.importance == "permutation":
+            self._set_permutation_importances(data, labels)
+
+    def _fit_batches(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
+
+        # Warm start adds batch_size trees to the previous ones, up to the number of trees of the estimator
+        # The given estimator is not modified
+        self.set_num_features(data)
+        self.imp = clone(self.imp)
+        max_estimators = self.imp.get_params()["n_estimators"]
+        self.imp.set_params(warm_start=True)
+
+        num_estimators, rank_correlations, is_top_k_same = [], [], []
+        importances, top_k, num_stable = None, None, 0
+        for n_estimators in range(self.batch_size, max_estimators + self.batch_size, self.batch_size):
+            self.imp.set_params(n_estimators=min(n_estimators, max_estimators))
+            self.imp.fit(X=data, y=labels)
+            num_estimators.append(self.imp.get_params()["n_estimators"])
+
+            # Compare the ranking of features with the previous batch
+            previous_importances, previous_top_k = importances, top_k
+            importances = self.imp.feature_importances_
+            top_k = set(np.argpartition(importances, -self.num_features)[-self.num_features:])
+            if previous_importances is not None:
+                correlation = 1.0 if np.array_equal(previous_importances, importances) \
+                    else spearmanr(previous_importances, importances).correlation
+                rank_correlations.append(correlation)
+                is_top_k_same.append(top_k == previous_top_k)
+                is_stable = is_top_k_same[-1] and correlation >= _MIN_RANK_CORRELATION
+                num_stable = num_stable + 1 if is_stable else 0
+                if num_stable >= _PATIENCE:
+                    break
+
+        # Set importance as feature importances of the trees so far
+        self.abs_scores = importances
+        self.diagnostics = {"num_estimators": num_estimators, "rank_correlations": rank_correlations,
+                            "is_top_k_same": is_top_k_same, "converged": num_stable >= _PATIENCE}
+
+    def _set_permutation_importances(self, data: pd.DataFrame, labels: pd.Series) -> NoReturn:
+
+        # Importance is measured on the training data, as there is no held-out data in fit
+        # sklearn trees predict float32, which halves the memory of permuted copies,
+        # boosting libraries split on float64 thresholds, hence their data is not rounded
+        values = data.to_numpy(dtype=np.float64 if _is_boosting(self.imp) else np.float32)
+        is_classifier = is_classification(labels)
+        labels = labels.to_numpy()
+        baseline = _score(self.imp.predict(pd.DataFrame(values, columns=data.columns, copy=False)),
+                          labels, is_classifier)
+
+        # Same permutations of rows for all features, each job permutes its features in its own buffer
+        rng = np.random.default_rng(self.seed)
+        permutations = [rng.permutation(len(values)) for _ in range(_NUM_REPEATS)]
+        tasks = [(column, repeat) for column in range(values.shape[1]) for repeat in range(_NUM_REPEATS)]
+        n_jobs = min(effective_n_jobs(self.n_jobs), len(tasks))
+        num_blocks = max(1, _BUFFER_SIZE // (n_jobs * values.size))
+        tasks_of_jobs = [[tasks[i] for i in indices] for indices in np.array_split(np.arange(len(tasks)), n_jobs)]
+        output_list = Parallel(n_jobs=n_jobs, require="sharedmem")(
+            delayed(_permuted_scores)(self.imp, values, data.columns, labels, is_classifier, permutations, job_tasks,
+                                      num_blocks)
+            for job_tasks in tasks_of_jobs)
+        scores = np.concatenate(output_list).reshape((values.shape[1], _NUM_REPEATS))
+
+        # Set importance as mean decrease of score, negative when permuting the feature improves the score
+        decreases = baseline - scores
+        self.abs_scores = decreases.mean(axis=1)
+        self.diagnostics = {**(self.diagnostics or {}), "baseline_score": baseline,
+                            "importances_std": decreases.std(axis=1)}
 
     def transform(self, data: pd.DataFrame) -> pd.DataFrame:
 
         # Select top-k from data based on abs_scores and num_features
         return self.get_top_k(data, self.abs_scores)
+
+
+def _is_boosting(estimator) -> bool:
+    """
+    Whether the estimator is XGBoost, LightGBM or CatBoost, which bin the data before growing trees.
+    """
+    return isinstance(estimator, (XGBModel, LGBMModel, CatBoost))
+
+
+def _score(predictions: np.ndarray, labels: np.ndarray, is_classifier: bool) -> float:
+    """
+    Returns the accuracy of classification or the R^2 of regression, the default score of sklearn estimators.
+    """
+    predictions = np.ravel(predictions)
+    if is_classifier:
+        return float(np.mean(predictions == labels))
+    total = np.sum(np.square(labels - np.mean(labels)))
+    return float(1 - np.sum(np.square(labels - predictions)) / total) if total > 0 else 0.0
+
+
+def _permuted_scores(estimator, values: np.ndarray, columns: pd.Index, labels: np.ndarray, is_classifier: bool,
+                     permutations: List[np.ndarray], tasks: List[Tuple[int, int]], num_blocks: int) -> np.ndarray:
+    """
+    Returns the score of the estimator for each task of a feature and a permutation of its rows.
+
+    The buffer holds num_blocks copies of the data, allocated once, and each block permutes a single feature.
+    Only the permuted feature of a block is restored and replaced for the next task,
+    and the blocks are predicted at once, through a data frame view of the buffer with the fitted feature names.
+    """
+
+    num_rows = len(values)
+    num_blocks = min(num_blocks, len(tasks))
+    buffer = np.tile(values, (num_blocks, 1))
+    permuted = [None] * num_blocks
+
+    scores = np.empty(len(tasks))
+    for start in range(0, len(tasks), num_blocks):
+        batch = tasks[start:start + num_blocks]
+        for block, (column, repeat) in enumerate(batch):
+            rows = slice(block * num_rows, (block + 1) * num_rows)
+            if permuted[block] is not None:
+                buffer[rows, permuted[block]] = values[:, permuted[block]]
+            buffer[rows, column] = values[permutations[repeat], column]
+            permuted[block] = column
+
+        view = pd.DataFrame(buffer[:len(batch) * num_rows], columns=columns, copy=False)
+        predictions = np.ravel(estimator.predict(view)).reshape((len(batch), num_rows))
+        for block in range(len(batch)):
+            scores[start + block] = _score(predictions[block], labels, is_classifier)
+
+    return scores
+
@@ -12,6 +12,7 @@ from typing import Dict, Union, NamedTuple, NoReturn
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_selection import SelectKBest, SelectPercentile
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler
@@ -120,6 +121,333 @@ class _CapFloor:
         return self.transform(contexts)
 
 
+class _RunningMoments:
+    """
+    Count, column means and centered cross-products accumulated chunk by chunk.
+
+    Chunks are combined with the pairwise update of Chan et al., which is numerically stable
+    and lets statistics of separate chunks be merged in any order.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.count = 0
+        self.mean = None
+        self.cross_product = None
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of rows to the statistics.
+
+        :param values: Chunk of rows. Array-like.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[0] == 0:
+            return
+
+        chunk = _RunningMoments()
+        chunk.count = values.shape[0]
+        chunk.mean = values.mean(axis=0)
+        centered = values - chunk.mean
+        chunk.cross_product = centered.T @ centered
+        self.merge(chunk)
+
+    def merge(self, other: '_RunningMoments'):
+        """
+        Add the statistics of another set of rows.
+
+        :param other: Statistics of the other rows. _RunningMoments.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.cross_product = other.count, other.mean.copy(), other.cross_product.copy()
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.cross_product = self.cross_product + other.cross_product + \
+            np.outer(delta, delta) * (self.count * other.count / count)
+        self.mean = self.mean + delta * (other.count / count)
+        self.count = count
+
+    def correlation(self) -> np.ndarray:
+        """
+        Pearson correlation matrix, undefined (NaN) for constant columns.
+
+        :return: correlation: Correlation matrix. Array.
+        """
+        norms = np.sqrt(np.diag(self.cross_product))
+        is_constant = norms == 0
+        norms[is_constant] = 1
+        correlation = np.clip(self.cross_product / np.outer(norms, norms), -1, 1)
+        np.fill_diagonal(correlation, 1)
+        correlation[is_constant, :] = np.nan
+        correlation[:, is_constant] = np.nan
+        return correlation
+
+
+class _RunningVariance:
+    """
+    Count, mean, sum of squared deviations, minimum and maximum of each column accumulated chunk by chunk.
+
+    Missing values are skipped as in np.nanvar.
+    Chunks are combined with the pairwise update of Chan et al., column by column.
+    Sparse chunks are accumulated from their stored values, without densifying.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.num_rows = 0
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of rows to the statistics.
+
+        :param values: Chunk of rows. Array-like or sparse matrix.
+        """
+        if sparse.issparse(values):
+            self.merge(_RunningVariance._from_sparse(values))
+            return
+
+        values = np.asarray(values, dtype=np.float64)
+        observed = ~np.isnan(values)
+
+        chunk = _RunningVariance()
+        chunk.num_rows = values.shape[0]
+        if observed.all():
+            # No missing values, skip the masking copies
+            chunk.count = np.full(values.shape[1], values.shape[0])
+            chunk.mean = values.mean(axis=0) if values.shape[0] else np.zeros(values.shape[1])
+            centered = values - chunk.mean
+            chunk.m2 = np.einsum("ij,ij->j", centered, centered)
+            chunk.min = values.min(axis=0, initial=np.inf)
+            chunk.max = values.max(axis=0, initial=-np.inf)
+        else:
+            chunk.count = observed.sum(axis=0)
+            chunk.mean = np.where(observed, values, 0).sum(axis=0) / np.maximum(chunk.count, 1)
+            chunk.m2 = np.where(observed, np.square(values - chunk.mean), 0).sum(axis=0)
+            chunk.min = np.where(observed, values, np.inf).min(axis=0, initial=np.inf)
+            chunk.max = np.where(observed, values, -np.inf).max(axis=0, initial=-np.inf)
+        self.merge(chunk)
+
+    @staticmethod
+    def _from_sparse(values: sparse.spmatrix) -> '_RunningVariance':
+        """
+        Statistics of a sparse chunk, where implicit zeros are observed values.
+
+        :param values: Chunk of rows. Sparse matrix.
+        :return: chunk: Statistics of the chunk. _RunningVariance.
+        """
+        values = sparse.csr_matrix(values, dtype=np.float64)
+        values.sum_duplicates()
+        check_true(not np.isnan(values.data).any(), ValueError("Sparse data cannot have missing values."))
+        num_rows, num_columns = values.shape
+
+        # Column of each stored value, and the number of implicit zeros of each column
+        columns = values.indices
+        num_zeros = num_rows - np.bincount(columns, minlength=num_columns)
+
+        # Two pass sum of squared deviations, implicit zeros deviate by the mean
+        chunk = _RunningVariance()
+        chunk.num_rows = num_rows
+        chunk.count = np.full(num_columns, num_rows)
+        chunk.mean = np.bincount(columns, weights=values.data, minlength=num_columns) / max(num_rows, 1)
+        chunk.m2 = np.bincount(columns, weights=np.square(values.data - chunk.mean[columns]), minlength=num_columns) \
+            + num_zeros * np.square(chunk.mean)
+        if num_rows > 0:
+            chunk.min = values.min(axis=0).toarray().ravel()
+            chunk.max = values.max(axis=0).toarray().ravel()
+        return chunk
+
+    def merge(self, other: '_RunningVariance'):
+        """
+        Add the statistics of another set of rows.
+
+        :param other: Statistics of the other rows. _RunningVariance.
+        """
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(count > 0, other.count / count, 0)
+        self.num_rows = self.num_rows + other.num_rows
+        self.m2 = self.m2 + other.m2 + np.square(delta) * self.count * weight
+        self.mean = self.mean + delta * weight
+        self.count = count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def variance(self) -> np.ndarray:
+        """
+        Population variance of each column, NaN for columns without observed values.
+
+        :return: variance: Variance of each column. Array.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    def peak_to_peak(self) -> np.ndarray:
+        """
+        Range of each column, NaN for columns with missing values as in np.ptp.
+
+        :return: peak_to_peak: Maximum minus minimum of each column. Array.
+        """
+        return np.where((self.count > 0) & (self.count == self.num_rows), self.max - self.min, np.nan)
+
+
+class _RunningClassSums:
+    """
+    Count, column sums and column sums of squares of each class accumulated chunk by chunk.
+
+    These are the statistics that the ANOVA F-test and chi-square of sklearn are computed from.
+    Sparse chunks are summed without densifying.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.classes = np.empty(0)
+        self.count = np.zeros(0)
+        self.sums = None
+        self.squares = None
+
+    def update(self, values: Union[np.ndarray, sparse.spmatrix], labels: np.ndarray):
+        """
+        Add a chunk of rows to the statistics.
+
+        :param values: Chunk of rows. Array-like or sparse matrix.
+        :param labels: Class of each row. Array-like.
+        """
+        if sparse.issparse(values):
+            values = sparse.csr_matrix(values, dtype=np.float64)
+            squared = values.multiply(values)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+            squared = np.square(values)
+
+        # Sums of each class as the product with the sparse class indicator matrix
+        chunk = _RunningClassSums()
+        chunk.classes, codes = np.unique(np.asarray(labels), return_inverse=True)
+        indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))),
+                                      shape=(len(chunk.classes), len(codes)))
+        chunk.count = np.bincount(codes, minlength=len(chunk.classes))
+        chunk.sums = _to_dense(indicator @ values)
+        chunk.squares = _to_dense(indicator @ squared)
+        self.merge(chunk)
+
+    def merge(self, other: '_RunningClassSums'):
+        """
+        Add the statistics of another set of rows, classes of both are aligned.
+
+        :param other: Statistics of the other rows. _RunningClassSums.
+        """
+        if other.sums is None:
+            return
+        if self.sums is None:
+            self.classes, self.count = other.classes.copy(), other.count.copy()
+            self.sums, self.squares = other.sums.copy(), other.squares.copy()
+            return
+
+        classes = np.union1d(self.classes, other.classes)
+        count = np.zeros(len(classes), dtype=self.count.dtype)
+        sums = np.zeros((len(classes), self.sums.shape[1]))
+        squares = np.zeros_like(sums)
+        for stats in [self, other]:
+            index = np.searchsorted(classes, stats.classes)
+            count[index] += stats.count
+            sums[index] += stats.sums
+            squares[index] += stats.squares
+        self.classes, self.count, self.sums, self.squares = classes, count, sums, squares
+
+
+class _RunningCovariance:
+    """
+    Count, means and sums of squared deviations of each column and each target,
+    and the co-moments of each target with each column, accumulated chunk by chunk.
+
+    These are the statistics that the F-test of a linear regression on each column is computed from.
+    Multiple targets share the statistics of the columns, co-moments are a single product with the targets.
+    Chunks are combined with the pairwise update of Chan et al.
+    Sparse chunks are accumulated without densifying.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+        self.target_mean = 0
+        self.target_m2 = 0
+        self.co_moment = 0
+
+    def update(self, values: Union[np.ndarray, sparse.spmatrix], targets: np.ndarray):
+        """
+        Add a chunk of rows to the statistics.
+
+        :param values: Chunk of rows. Array-like or sparse matrix.
+        :param targets: Target of each row, or targets in columns. Array-like.
+        """
+        targets = np.asarray(targets, dtype=np.float64)
+        if len(targets) == 0:
+            return
+
+        chunk = _RunningCovariance()
+        chunk.count = len(targets)
+        chunk.target_mean = targets.mean(axis=0)
+        centered_targets = targets - chunk.target_mean
+        chunk.target_m2 = np.einsum("i...,i...->...", centered_targets, centered_targets)
+
+        # The co-moment only needs the centered target, columns are not centered
+        if sparse.issparse(values):
+            values = sparse.csr_matrix(values, dtype=np.float64)
+            chunk.mean = _to_dense(values.sum(axis=0)).ravel() / chunk.count
+            chunk.m2 = _to_dense(values.multiply(values).sum(axis=0)).ravel() - chunk.count * np.square(chunk.mean)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+            chunk.mean = values.mean(axis=0)
+            centered = values - chunk.mean
+            chunk.m2 = np.einsum("ij,ij->j", centered, centered)
+        chunk.co_moment = (values.T @ centered_targets).T
+        self.merge(chunk)
+
+    def merge(self, other: '_RunningCovariance'):
+        """
+        Add the statistics of another set of rows.
+
+        :param other: Statistics of the other rows. _RunningCovariance.
+        """
+        if other.count == 0:
+            return
+
+        count = self.count + other.count
+        weight = self.count * other.count / count
+        delta = other.mean - self.mean
+        target_delta = other.target_mean - self.target_mean
+        self.m2 = self.m2 + other.m2 + np.square(delta) * weight
+        self.target_m2 = self.target_m2 + other.target_m2 + target_delta * target_delta * weight
+        self.co_moment = self.co_moment + other.co_moment + np.multiply.outer(target_delta, delta) * weight
+        self.mean = self.mean + delta * (other.count / count)
+        self.target_mean = self.target_mean + target_delta * (other.count / count)
+        self.count = count
+
+
+def _to_dense(values: Union[np.ndarray, sparse.spmatrix]) -> np.ndarray:
+    # Dense array of a product or a sum that can be sparse
+    return values.toarray() if sparse.issparse(values) else np.asarray(values)
+
+
 class DataTransformer:
     """
     Performs standard pre-processing of input contexts used for training and scoring.
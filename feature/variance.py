@@ -2,13 +2,17 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-import itertools
-from typing import NoReturn
+from typing import NoReturn, Union
 
+import numpy as np
 import pandas as pd
-from sklearn.feature_selection import VarianceThreshold
+from scipy import sparse
 
 from feature.base import _BaseUnsupervisedSelector
+from feature.utils import _RunningVariance, check_true
+
+# Number of values per chunk of rows in fit, which bounds the float64 copies
+_CHUNK_SIZE = 2 ** 22
 
 
 class _Variance(_BaseUnsupervisedSelector):
@@ -17,27 +21,75 @@ class _Variance(_BaseUnsupervisedSelector):
         super().__init__(seed)
 
         # Track columns that meet variance threshold
+        self.threshold = threshold
         self.keep_features = None
-        self.imp: VarianceThreshold = VarianceThreshold(threshold)
 
-    def fit(self, data: pd.DataFrame) -> NoReturn:
+        # Feature names and the running statistics of each feature
+        self.columns = None
+        self.moments = None
+
+    def fit(self, data: Union[pd.DataFrame, sparse.spmatrix]) -> NoReturn:
+
+        # Fit from scratch in a single streaming pass over chunks of rows
+        # Sparse data is accumulated at once from its stored values
+        self.moments = None
+        if sparse.issparse(data):
+            self.partial_fit(data)
+        else:
+            chunk_size = max(1, _CHUNK_SIZE // max(1, data.shape[1]))
+            for start in range(0, max(1, len(data)), chunk_size):
+                self.partial_fit(data.iloc[start:start + chunk_size])
+
+        self.finalize()
 
-        # Fit data
-        self.imp.fit(data)
+    def partial_fit(self, data: Union[pd.DataFrame, sparse.spmatrix]) -> NoReturn:
 
-        # Boolean support mask for columns above threshold
-        support = self.imp.get_support()
+        # Sparse data has no feature names, features are named by position
+        columns = pd.RangeIndex(data.shape[1]) if sparse.issparse(data) else data.columns
+
+        if self.moments is None:
+            self.moments = _RunningVariance()
+            self.columns = columns
+        else:
+            check_true(columns.equals(self.columns),
+                       ValueError("Columns of each chunk must be the same as the first chunk."))
+
+        # Accumulate statistics, features to keep are found on demand
+        self.moments.update(data if sparse.issparse(data) else data.values)
+        self.keep_features = None
+
+    def merge(self, other: '_Variance') -> NoReturn:
+
+        # Combine statistics of another shard of rows
+        check_true(other.columns.equals(self.columns),
+                   ValueError("Columns of merged selectors must be the same."))
+        self.moments.merge(other.moments)
+        self.keep_features = None
+
+    def finalize(self) -> NoReturn:
+
+        # Nothing to do once statistics are finalized
+        if self.moments is None or self.keep_features is not None:
+            return
 
         # Set importance as variances
-        self.abs_scores = self.imp.variances_
+        # When threshold is zero, constant features are found exactly with peak to peak, as in sklearn
+        variances = self.moments.variance()
+        if self.threshold == 0:
+            variances = np.fmin(variances, self.moments.peak_to_peak())
+
+        check_true(np.any(np.isfinite(variances) & (variances > self.threshold)),
+                   ValueError("No feature in X meets the variance threshold {0:.5f}".format(self.threshold)))
+        self.abs_scores = variances
 
         # Store Feature names above threshold
-        self.keep_features = list(itertools.compress(data.columns, support))
+        self.keep_features = list(self.columns[variances > self.threshold])
 
-    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+    def transform(self, data: Union[pd.DataFrame, sparse.spmatrix]) -> Union[pd.DataFrame, sparse.spmatrix]:
 
-        # Reduced numpy matrix
-        X_reduced = self.imp.transform(data)
+        # Return sparse matrix with reduced columns, without densifying
+        if sparse.issparse(data):
+            return data[:, self.columns.get_indexer(self.keep_features)]
 
-        # Return dataframe with reduced column names
-        return pd.DataFrame(X_reduced, columns=self.keep_features)
+        # Return dataframe with reduced columns
+        return data[self.keep_features].copy()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: GNU GPLv3
+
+"""
+Timing of Spearman correlation against pandas, outside of the unit tests.
+
+Run from the repository root with: python -m tests.benchmark_correlation
+"""
+
+from time import time
+
+import numpy as np
+import pandas as pd
+
+from feature.selector import Selective, SelectionMethod
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(5)
+    data = pd.DataFrame(rng.normal(size=(5000, 200)))
+    data[1] = data[1].round(1)
+
+    t0 = time()
+    expected = data.corr(method="spearman").abs().mean(0).values
+    pandas_time = time() - t0
+
+    # Rank once and matrix multiplication
+    t0 = time()
+    selector = Selective(SelectionMethod.Correlation(0.60, method="spearman"))
+    selector.fit(data)
+    rank_once_time = time() - t0
+
+    print(f"pandas: {pandas_time:.3f}s, rank once: {rank_once_time:.3f}s, "
+          f"max difference: {np.max(np.abs(selector.get_absolute_scores() - expected)):.2e}")
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: GNU GPLv3
+
+"""
+Timing of stability selection over half subsamples, outside of the unit tests.
+
+Run from the repository root with: python -m tests.benchmark_stability
+"""
+
+from time import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor
+
+from feature.selector import Selective, SelectionMethod
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(5)
+    data = pd.DataFrame(rng.normal(size=(20000, 200)))
+    label = pd.Series(data[0] + data[1] + data[2] + rng.normal(size=len(data)))
+
+    methods = {"lasso": SelectionMethod.Linear(num_features=5, regularization="lasso"),
+               "lasso_path": SelectionMethod.Linear(num_features=5, regularization="lasso", alpha="path"),
+               "extra_trees": SelectionMethod.TreeBased(num_features=5,
+                                                        estimator=ExtraTreesRegressor(n_estimators=10, max_depth=8,
+                                                                                      random_state=5))}
+    for method_name, method in methods.items():
+        selector = Selective(SelectionMethod.Stability(method, num_subsamples=20))
+        t0 = time()
+        selector.fit(data, label)
+        print(f"{method_name}: {time() - t0:.3f}s")
@@ -2,16 +2,19 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import numpy as np
+import pandas as pd
 from catboost import CatBoostClassifier, CatBoostRegressor
 from lightgbm import LGBMClassifier, LGBMRegressor
 from sklearn.datasets import load_boston, load_iris
 from sklearn.ensemble import AdaBoostClassifier, AdaBoostRegressor
 from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor
 from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+from sklearn.model_selection import KFold
 from xgboost import XGBClassifier, XGBRegressor
 
-from feature.utils import get_data_label
-from feature.selector import SelectionMethod, benchmark, calculate_statistics
+from feature.utils import get_data_label, Constants
+from feature.selector import Selective, SelectionMethod, benchmark, calculate_statistics
 from tests.test_base import BaseTest
 
 
@@ -43,8 +46,12 @@ class TestBenchmark(BaseTest):
         "gradient_reg": SelectionMethod.TreeBased(num_features, estimator=GradientBoostingRegressor(**tree_params)),
         "adaboost_clf": SelectionMethod.TreeBased(num_features, estimator=AdaBoostClassifier(**tree_params)),
         "adaboost_reg": SelectionMethod.TreeBased(num_features, estimator=AdaBoostRegressor(**tree_params)),
-        "catboost_clf": SelectionMethod.TreeBased(num_features, estimator=CatBoostClassifier(**tree_params, silent=True)),
-        "catboost_reg": SelectionMethod.TreeBased(num_features, estimator=CatBoostRegressor(**tree_params, silent=True))
+        "catboost_clf": SelectionMethod.TreeBased(num_features,
+                                                  estimator=CatBoostClassifier(**tree_params, silent=True,
+                                                                                allow_writing_files=False)),
+        "catboost_reg": SelectionMethod.TreeBased(num_features,
+                                                  estimator=CatBoostRegressor(**tree_params, silent=True,
+                                                                               allow_writing_files=False))
     }
 
     def test_benchmark_regression(self):
@@ -210,4 +217,82 @@ class TestBenchmark(BaseTest):
                                    score_df["ridge"].to_list())
 
         self.assertListAlmostEqual([0.4185294825699565, 0.4472560913161835, 0.10091608418224696, 0.03329834193161316],
-                                   score_df["random_forest"].to_list())
\ No newline at end of file
+                                   score_df["random_forest"].to_list())
+
+    def test_benchmark_threshold_sweep(self):
+        data, label = get_data_label(load_boston())
+
+        selectors = {"corr_high": SelectionMethod.Correlation(0.8, method="kendall"),
+                     "linear": SelectionMethod.Linear(self.num_features, regularization="none"),
+                     "corr_low": SelectionMethod.Correlation(0.4, method="kendall"),
+                     "corr_pearson": SelectionMethod.Correlation(0.4, method="pearson")}
+
+        # Kendall thresholds share a single fit
+        score_df, selected_df, runtime_df = benchmark(selectors, data, label)
+        self.assertListEqual(list(score_df.columns), list(selectors.keys()))
+        self.assertListEqual(list(runtime_df["method"]), list(selectors.keys()))
+
+        for method_name, method in selectors.items():
+            selector = Selective(method)
+            subset = selector.fit_transform(data, label)
+            self.assertListAlmostEqual(score_df[method_name].to_list(), list(selector.get_absolute_scores()))
+            self.assertListEqual(selected_df[method_name].to_list(), [int(c in subset.columns) for c in data.columns])
+
+    def test_benchmark_threshold_sweep_approximate(self):
+        rng = np.random.default_rng(11)
+        common = rng.normal(size=(100, 1))
+        data = pd.DataFrame(np.hstack([common + 0.5 * rng.normal(size=(100, 10)), rng.normal(size=(100, 290))]))
+
+        selectors = {"approx_high": SelectionMethod.Correlation(0.7, approximate=True),
+                     "approx_low": SelectionMethod.Correlation(0.2, approximate=True),
+                     "exact_high": SelectionMethod.Correlation(0.7),
+                     "exact_low": SelectionMethod.Correlation(0.2)}
+
+        # Same as fitting each selector on its own, approximate screening depends on the threshold
+        score_df, selected_df, runtime_df = benchmark(selectors, data)
+        self.assertListEqual(list(runtime_df["method"]), list(selectors.keys()))
+        for method_name, method in selectors.items():
+            selector = Selective(method)
+            subset = selector.fit_transform(data)
+            self.assertTrue(np.allclose(score_df[method_name].values, selector.get_absolute_scores()))
+            self.assertListEqual(selected_df[method_name].to_list(), [int(c in subset.columns) for c in data.columns])
+
+    def test_benchmark_closed_form_cv(self):
+        data, label = get_data_label(load_boston())
+
+        selectors = {"corr_pearson": SelectionMethod.Correlation(0.4, method="pearson"),
+                     "ridge": SelectionMethod.Linear(self.num_features, regularization="ridge"),
+                     "linear": SelectionMethod.Linear(self.num_features, regularization="none")}
+
+        # Least squares and ridge folds are solved from the statistics of all folds
+        score_df, selected_df, runtime_df = benchmark(selectors, data, label, cv=3)
+        self.assertListEqual(list(score_df.columns), list(selectors.keys()))
+        self.assertListEqual(list(runtime_df["method"]), list(selectors.keys()) * 3)
+
+        # Same as fitting each fold
+        for fold, (train_index, _) in enumerate(KFold(n_splits=3, shuffle=True,
+                                                      random_state=Constants.default_seed).split(data)):
+            train_data = data.iloc[train_index]
+            train_label = label.iloc[train_index]
+            for method_name in ["ridge", "linear"]:
+                selector = Selective(selectors[method_name])
+                subset = selector.fit_transform(train_data, train_label)
+                fold_scores = score_df[method_name].iloc[fold * len(data.columns):(fold + 1) * len(data.columns)]
+                fold_selected = selected_df[method_name].iloc[fold * len(data.columns):(fold + 1) * len(data.columns)]
+                self.assertListAlmostEqual(fold_scores.to_list(), list(selector.get_absolute_scores()))
+                self.assertListEqual(fold_selected.to_list(), [int(c in subset.columns) for c in data.columns])
+
+    def test_benchmark_closed_form_cv_missing_labels(self):
+        data, label = get_data_label(load_boston())
+        label = label.copy()
+        label.iloc[:10] = np.nan
+
+        selectors = {"corr_pearson": SelectionMethod.Correlation(0.4, method="pearson"),
+                     "linear": SelectionMethod.Linear(self.num_features, regularization="none")}
+
+        # Missing labels are fit on each fold as usual, the exception is reported in runtime
+        score_df, selected_df, runtime_df = benchmark(selectors, data, label, cv=2)
+        self.assertListEqual(list(score_df.columns), list(selectors.keys()))
+        self.assertTrue(all("(exception)" in str(runtime)
+                            for runtime in runtime_df.loc[runtime_df["method"] == "linear", "runtime"]))
+        self.assertListEqual(selected_df["linear"].to_list(), [0] * len(selected_df))
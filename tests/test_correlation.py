@@ -2,9 +2,14 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import pickle
+
+import numpy as np
+import pandas as pd
 from sklearn.datasets import load_boston
-from feature.utils import get_data_label
-from feature.selector import Selective, SelectionMethod
+from feature.correlation import _count_inversions
+from feature.utils import _RunningMoments, get_data_label
+from feature.selector import Selective, SelectionMethod, correlation_sweep
 from tests.test_base import BaseTest
 
 
@@ -73,3 +78,248 @@ class TestCorrelation(BaseTest):
         subset = selector.fit_transform(data)
 
         self.assertListEqual(list(subset.columns), ['CRIM', 'ZN', 'INDUS', 'CHAS', 'RM', 'PTRATIO', 'B'])
+
+    def test_correlation_blocked(self):
+        data, label = get_data_label(load_boston())
+
+        # Expected from the full pandas correlation matrix
+        corr_matrix = data.corr().abs()
+        upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
+        to_drop = [column for column in upper.columns if any(upper[column] > 0.60)]
+
+        for block_size in [1, 3, 5, 13, 100]:
+            method = SelectionMethod.Correlation(0.60, block_size=block_size)
+            selector = Selective(method)
+            subset = selector.fit_transform(data)
+
+            self.assertListEqual(list(subset.columns), [c for c in data.columns if c not in to_drop])
+            self.assertListAlmostEqual(selector.get_absolute_scores(), corr_matrix.mean(0).values)
+
+    def test_correlation_blocked_float32(self):
+        data, label = get_data_label(load_boston())
+
+        method = SelectionMethod.Correlation(0.60, block_size=4, dtype="float32")
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+
+        self.assertListEqual(list(subset.columns), ['CRIM', 'ZN', 'INDUS', 'CHAS', 'RM', 'PTRATIO', 'B'])
+        self.assertListAlmostEqual(selector.get_absolute_scores(), data.corr().abs().mean(0).values)
+
+    def test_correlation_blocked_constant(self):
+        rng = np.random.default_rng(7)
+        data = pd.DataFrame(rng.normal(size=(50, 4)), columns=["a", "b", "c", "d"])
+        data["b"] = 1.0
+        data["d"] = data["a"] * 2
+
+        method = SelectionMethod.Correlation(0.90, block_size=2)
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+
+        # Correlation with constant column is undefined, and skipped as in pandas
+        expected = data.corr().abs().mean(0).values
+        scores = selector.get_absolute_scores()
+        self.assertTrue(np.isnan(scores[1]))
+        self.assertListAlmostEqual(scores[[0, 2, 3]], expected[[0, 2, 3]])
+        self.assertListEqual(list(subset.columns), ["a", "b", "c"])
+
+    def test_correlation_invalid_block(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Correlation(0.60, block_size=0))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Correlation(0.60, dtype="float16"))
+
+    def test_correlation_graph(self):
+        data, label = get_data_label(load_boston())
+
+        method = SelectionMethod.Correlation(0.60, block_size=4)
+        selector = Selective(method)
+        selector.fit(data)
+
+        # Only highly correlated pairs are stored, from smaller to larger index
+        corr_matrix = data.corr().abs().values
+        expected = np.argwhere(np.triu(corr_matrix > 0.60, k=1))
+        graph = selector._imp.graph.tocoo()
+        self.assertListEqual(sorted(zip(graph.row, graph.col)), [tuple(pair) for pair in expected])
+        self.assertListAlmostEqual(graph.data[np.lexsort((graph.col, graph.row))], corr_matrix[tuple(expected.T)])
+
+    def test_correlation_pickle(self):
+        data, label = get_data_label(load_boston())
+
+        method = SelectionMethod.Correlation(0.60)
+        selector = Selective(method)
+        selector.fit(data)
+
+        # Fitted selector can be shipped to score new data
+        selector = pickle.loads(pickle.dumps(selector))
+        subset = selector.transform(data)
+        self.assertListEqual(list(subset.columns), ['CRIM', 'ZN', 'INDUS', 'CHAS', 'RM', 'PTRATIO', 'B'])
+
+    def test_correlation_kendall_ties(self):
+        rng = np.random.default_rng(11)
+        data = pd.DataFrame({"a": rng.integers(0, 5, 300), "b": rng.normal(size=300),
+                             "c": rng.integers(0, 3, 300), "d": np.ones(300)})
+        data["e"] = data["a"] * 2 + data["b"]
+        data["f"] = data["a"] + data["c"]
+
+        # Same Tau-b as pandas, including ties and constant features
+        expected = data.corr(method="kendall").abs()
+        for block_size, n_jobs in [(1, 1), (2, 2), (4, -1), (1024, 1)]:
+            method = SelectionMethod.Correlation(0.50, method="kendall", block_size=block_size, n_jobs=n_jobs)
+            selector = Selective(method)
+            subset = selector.fit_transform(data)
+
+            self.assertListAlmostEqual(selector.get_absolute_scores(), expected.mean(0).values)
+            self.assertListEqual(list(subset.columns), ["a", "b", "c", "d"])
+
+    def test_correlation_kendall_inversions(self):
+        rng = np.random.default_rng(3)
+        for num_rows in [1, 2, 15, 16, 17, 40, 333]:
+            y = rng.integers(0, 10, size=(3, num_rows)).astype(np.int32)
+            expected = [sum((row[i] > row[i + 1:]).sum() for i in range(num_rows)) for row in y]
+            self.assertListEqual(list(_count_inversions(y)), expected)
+
+    def test_correlation_spearman_rank_once(self):
+        data, label = get_data_label(load_boston())
+
+        method = SelectionMethod.Correlation(0.60, method="spearman", block_size=5)
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+
+        expected = data.corr(method="spearman").abs()
+        upper = expected.where(np.triu(np.ones(expected.shape), k=1).astype(bool))
+        to_drop = [column for column in upper.columns if any(upper[column] > 0.60)]
+        self.assertListAlmostEqual(selector.get_absolute_scores(), expected.mean(0).values)
+        self.assertListEqual(list(subset.columns), [c for c in data.columns if c not in to_drop])
+
+    def test_correlation_spearman_ties(self):
+        rng = np.random.default_rng(5)
+        data = pd.DataFrame(rng.normal(size=(5000, 200)))
+        data[1] = data[1].round(1)
+
+        expected = data.corr(method="spearman").abs().mean(0).values
+        selector = Selective(SelectionMethod.Correlation(0.60, method="spearman"))
+        selector.fit(data)
+
+        # Rank once and matrix multiplication is the same as pandas
+        self.assertListAlmostEqual(selector.get_absolute_scores(), expected)
+
+    def test_correlation_approximate(self):
+        data, label = get_data_label(load_boston())
+
+        for method in ["pearson", "spearman"]:
+            exact = Selective(SelectionMethod.Correlation(0.60, method=method))
+            expected = exact.fit_transform(data)
+
+            selector = Selective(SelectionMethod.Correlation(0.60, method=method, approximate=True, recall=0.99))
+            subset = selector.fit_transform(data)
+
+            # Sample covers all columns of small data, hence exact scores
+            self.assertListAlmostEqual(selector.get_absolute_scores(), exact.get_absolute_scores())
+            self.assertListEqual(list(subset.columns), list(expected.columns))
+            self.assertGreater(selector.get_diagnostics()["recall_at_threshold"], 0.99)
+            self.assertIsNone(exact.get_diagnostics())
+
+    def test_correlation_approximate_planted(self):
+        rng = np.random.default_rng(7)
+        data = rng.normal(size=(500, 2000))
+        for column in range(0, 2000, 40):
+            data[:, column + 1] = -data[:, column] + 0.2 * rng.normal(size=500)
+        data = pd.DataFrame(data)
+
+        selector = Selective(SelectionMethod.Correlation(0.90, approximate=True, recall=0.99), seed=11)
+        subset = selector.fit_transform(data)
+
+        # Each planted pair drops its second column, and nothing else
+        self.assertListEqual(list(subset.columns), [c for c in data.columns if c % 40 != 1])
+        diagnostics = selector.get_diagnostics()
+        self.assertEqual(diagnostics["num_correlated"], 50)
+        self.assertLess(diagnostics["num_candidates"], diagnostics["num_pairs"])
+
+    def test_correlation_approximate_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Correlation(0.60, method="kendall", approximate=True))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Correlation(0.60, approximate=True, recall=1.0))
+        with self.assertRaises(Exception):
+            Selective(SelectionMethod.Correlation(0.60)).get_diagnostics()
+
+    def test_correlation_partial_fit(self):
+        data, label = get_data_label(load_boston())
+
+        exact = Selective(SelectionMethod.Correlation(0.60))
+        expected = exact.fit_transform(data)
+
+        # Chunks of uneven size, as read from disk
+        selector = Selective(SelectionMethod.Correlation(0.60, block_size=4))
+        for start in range(0, len(data), 77):
+            selector.partial_fit(data.iloc[start:start + 77])
+        subset = selector.transform(data)
+
+        self.assertListAlmostEqual(selector.get_absolute_scores(), exact.get_absolute_scores())
+        self.assertListEqual(list(subset.columns), list(expected.columns))
+
+    def test_correlation_partial_fit_merge(self):
+        rng = np.random.default_rng(9)
+        values = 1e6 + rng.normal(size=(1000, 5))
+        values[:, 1] += values[:, 0]
+
+        left, right = _RunningMoments(), _RunningMoments()
+        for start in range(0, 600, 100):
+            left.update(values[start:start + 100])
+        right.update(values[600:])
+        left.merge(right)
+
+        # Large offsets do not lose precision
+        self.assertEqual(left.count, 1000)
+        self.assertListAlmostEqual(left.correlation().ravel(), np.corrcoef(values, rowvar=False).ravel())
+
+    def test_correlation_partial_fit_invalid(self):
+        data, label = get_data_label(load_boston())
+
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Correlation(0.60, method="kendall")).partial_fit(data)
+
+        with self.assertRaises(ValueError):
+            selector = Selective(SelectionMethod.Correlation(0.60))
+            selector.partial_fit(data.iloc[:10])
+            selector.partial_fit(data.iloc[10:].drop(columns=["CRIM"]))
+
+        with self.assertRaises(ValueError):
+            data.iloc[0, 0] = np.nan
+            Selective(SelectionMethod.Correlation(0.60)).partial_fit(data)
+
+        with self.assertRaises(NotImplementedError):
+            Selective(SelectionMethod.TreeBased(5)).partial_fit(data.fillna(0), label)
+
+    def test_correlation_sweep(self):
+        data, label = get_data_label(load_boston())
+        thresholds = [0.9, 0.3, 0.6, 0.75]
+
+        selected = correlation_sweep(SelectionMethod.Correlation(method="spearman"), data, thresholds)
+
+        # Same selection as fitting each threshold separately
+        self.assertListEqual(list(selected.columns), thresholds)
+        self.assertListEqual(list(selected.index), list(data.columns))
+        for threshold in thresholds:
+            subset = Selective(SelectionMethod.Correlation(threshold, method="spearman")).fit_transform(data)
+            self.assertListEqual(list(data.columns[selected[threshold] == 1]), list(subset.columns))
+
+        with self.assertRaises(ValueError):
+            correlation_sweep(SelectionMethod.Correlation(), data, [0.5, 1.5])
+
+    def test_correlation_pairwise_complete(self):
+        data, label = get_data_label(load_boston())
+        rng = np.random.default_rng(13)
+        data = data.mask(rng.random(data.shape) < 0.3)
+        data["EMPTY"] = np.nan
+        data["SINGLE"] = np.nan
+        data.loc[0, "SINGLE"] = 1.0
+
+        selector = Selective(SelectionMethod.Correlation(0.50, block_size=4))
+        subset = selector.fit_transform(data)
+
+        expected = data.corr().abs()
+        upper = expected.where(np.triu(np.ones(expected.shape), k=1).astype(bool))
+        to_drop = [column for column in upper.columns if any(upper[column] > 0.50)]
+        self.assertTrue(np.allclose(selector.get_absolute_scores(), expected.mean(0).values, equal_nan=True))
+        self.assertListEqual(list(subset.columns), [c for c in data.columns if c not in to_drop])
@@ -2,8 +2,11 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-
+import numpy as np
+import pandas as pd
+from scipy import sparse
 from sklearn.datasets import load_boston, load_iris
+from sklearn.linear_model import Lasso
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -158,3 +161,121 @@ class TestLinear(BaseTest):
         # Reduced columns
         self.assertEqual(subset.shape[1], 3)
         self.assertListEqual(list(subset.columns), ['CRIM', 'AGE', 'LSTAT'])
+
+    def test_linear_sparse(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Linear(num_features=3)
+        expected = Selective(method).fit_transform(data, label)
+
+        selector = Selective(method)
+        subset = selector.fit_transform(sparse.csr_matrix(data.values), label)
+
+        self.assertTrue(sparse.issparse(subset))
+        self.assertTrue(np.allclose(subset.toarray(), expected.values))
+
+    def test_lasso_path(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Linear(num_features=3, regularization="lasso", alpha="path")
+        selector = Selective(method)
+        subset = selector.fit_transform(data, label)
+        path = selector.get_diagnostics()
+
+        # Path stops at the first alpha with num_features non-zero coefficients
+        self.assertEqual(subset.shape[1], 3)
+        self.assertEqual(path["num_nonzeros"][-1], 3)
+        self.assertLess(max(path["num_nonzeros"][:-1]), 3)
+        self.assertEqual(path["alpha"], path["alphas"][-1])
+        self.assertEqual(path["coefficients"].shape, (len(path["alphas"]), data.shape[1]))
+
+        # Same coefficients as lasso at the final alpha, for dense and sparse data
+        expected = Lasso(alpha=path["alpha"], tol=1e-10).fit(data, label)
+        self.assertListAlmostEqual(selector.get_absolute_scores(), abs(expected.coef_))
+        selector = Selective(method)
+        selector.fit(sparse.csr_matrix(data.values), label)
+        self.assertListAlmostEqual(selector.get_absolute_scores(), abs(expected.coef_))
+
+    def test_lasso_path_classif(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Linear(num_features=2, regularization="lasso", alpha="path")
+        selector = Selective(method)
+        subset = selector.fit_transform(data, label)
+
+        self.assertEqual(subset.shape[1], 2)
+        self.assertGreaterEqual(selector.get_diagnostics()["num_nonzeros"][-1], 2)
+        self.assertListEqual(list(subset.columns), list(data.columns[2:]))
+
+        # L1 logistic warm starts each alpha from the previous coefficients with saga
+        self.assertEqual(selector._imp.imp.solver, "saga")
+        self.assertTrue(selector._imp.imp.warm_start)
+
+    def test_lasso_path_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Linear(num_features=3, regularization="ridge", alpha="path"))
+        with self.assertRaises(TypeError):
+            Selective(SelectionMethod.Linear(num_features=3, regularization="lasso", alpha="auto"))
+
+    def test_sgd(self):
+        rng = np.random.default_rng(12345)
+        data = pd.DataFrame(rng.normal(size=(2000, 6)) * [1, 10, 100, 1, 10, 100])
+        label = pd.Series(data[1] / 10 - 2 * data[3] + data[5] / 100 + rng.normal(size=2000) / 10)
+
+        for regularization in ["none", "lasso", "ridge"]:
+            method = SelectionMethod.Linear(num_features=3, regularization=regularization, alpha=0.01,
+                                            solver="sgd")
+            selector = Selective(method)
+            subset = selector.fit_transform(data, label)
+            self.assertListEqual(list(subset.columns), [1, 3, 5])
+
+            # Importance of standardized features
+            diagnostics = selector.get_diagnostics()
+            self.assertTrue(diagnostics["converged"])
+            self.assertEqual(diagnostics["num_samples"], 2000)
+            self.assertEqual(len(diagnostics["losses"]), diagnostics["num_epochs"] - 1)
+
+        # Classification with sparse data
+        selector = Selective(SelectionMethod.Linear(num_features=3, solver="sgd"))
+        selector.fit(sparse.csr_matrix(data.values), (label > 0).astype(int))
+        self.assertListEqual(sorted(np.argsort(selector.get_absolute_scores())[-3:]), [1, 3, 5])
+
+    def test_sgd_partial_fit(self):
+        data, label = get_data_label(load_iris())
+
+        # Chunks of shuffled rows have all classes
+        rows = np.random.default_rng(12345).permutation(len(data))
+        data, label = data.iloc[rows], label.iloc[rows]
+
+        method = SelectionMethod.Linear(num_features=2, solver="sgd")
+        selector = Selective(method)
+        for start in range(0, len(data), 50):
+            selector.partial_fit(data.iloc[start:start + 50], label.iloc[start:start + 50])
+
+        subset = selector.transform(data)
+        self.assertEqual(subset.shape, (150, 2))
+        self.assertIn("petal width (cm)", subset.columns)
+        diagnostics = selector.get_diagnostics()
+        self.assertEqual(diagnostics["num_samples"], 150)
+        self.assertEqual(len(diagnostics["losses"]), 2)
+        self.assertEqual(len(diagnostics["coefficient_changes"]), 2)
+
+        # Exact solver does not learn from chunks
+        selector = Selective(SelectionMethod.Linear(num_features=2))
+        with self.assertRaises(NotImplementedError):
+            selector.partial_fit(data, label)
+
+    def test_sgd_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Linear(num_features=3, solver="adam"))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Linear(num_features=3, regularization="lasso", alpha="path", solver="sgd"))
+
+        # Classes of later chunks must be seen in the first chunk
+        data, label = get_data_label(load_iris())
+        selector = Selective(SelectionMethod.Linear(num_features=2, solver="sgd"))
+        selector.partial_fit(data.iloc[:60], label.iloc[:60])
+        with self.assertRaises(ValueError):
+            selector.partial_fit(data.iloc[100:], label.iloc[100:])
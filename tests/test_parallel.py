@@ -43,8 +43,12 @@ class TestParallel(BaseTest):
         "gradient_reg": SelectionMethod.TreeBased(num_features, estimator=GradientBoostingRegressor(**tree_params)),
         "adaboost_clf": SelectionMethod.TreeBased(num_features, estimator=AdaBoostClassifier(**tree_params)),
         "adaboost_reg": SelectionMethod.TreeBased(num_features, estimator=AdaBoostRegressor(**tree_params)),
-        "catboost_clf": SelectionMethod.TreeBased(num_features, estimator=CatBoostClassifier(**tree_params, silent=True)),
-        "catboost_reg": SelectionMethod.TreeBased(num_features, estimator=CatBoostRegressor(**tree_params, silent=True))
+        "catboost_clf": SelectionMethod.TreeBased(num_features,
+                                                  estimator=CatBoostClassifier(**tree_params, silent=True,
+                                                                                allow_writing_files=False)),
+        "catboost_reg": SelectionMethod.TreeBased(num_features,
+                                                  estimator=CatBoostRegressor(**tree_params, silent=True,
+                                                                               allow_writing_files=False))
     }
 
     def test_benchmark_regression(self):
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Copyright FMR LLC <opensource@fidelity.com>
+# SPDX-License-Identifier: GNU GPLv3
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.datasets import load_iris
+from sklearn.ensemble import ExtraTreesClassifier
+from feature.utils import get_data_label
+from feature.selector import Selective, SelectionMethod
+from tests.test_base import BaseTest
+
+
+class TestStability(BaseTest):
+
+    @staticmethod
+    def get_correlated_data():
+
+        # Three correlated features drive the label
+        rng = np.random.default_rng(12345)
+        common = rng.normal(size=(1000, 1))
+        data = pd.DataFrame(np.hstack([common + 0.1 * rng.normal(size=(1000, 3)), rng.normal(size=(1000, 5))]))
+        label = pd.Series(data[0] + data[1] + data[2] + rng.normal(size=1000))
+        return data, label
+
+    def test_stability_lasso(self):
+        data, label = self.get_correlated_data()
+
+        method = SelectionMethod.Stability(SelectionMethod.Linear(num_features=3, regularization="lasso"),
+                                           num_subsamples=20)
+        selector = Selective(method)
+        subset = selector.fit_transform(data, label)
+
+        # Selection probability of each feature
+        self.assertListAlmostEqual(list(selector.get_absolute_scores()), [0.95, 1, 1, 0, 0, 0, 0, 0])
+        self.assertListEqual(list(subset.columns), [0, 1, 2])
+
+        diagnostics = selector.get_diagnostics()
+        self.assertEqual(diagnostics["num_subsamples"], 20)
+        self.assertEqual(diagnostics["subsample_size"], 500)
+        self.assertEqual(len(diagnostics["mean_scores"]), 8)
+
+    def test_stability_parallel(self):
+        data, label = self.get_correlated_data()
+
+        # Same subsamples regardless of the number of processes
+        method = SelectionMethod.Linear(num_features=2, regularization="lasso")
+        selector = Selective(SelectionMethod.Stability(method, num_subsamples=10))
+        selector.fit(data, label)
+        parallel_selector = Selective(SelectionMethod.Stability(method, num_subsamples=10, n_jobs=2))
+        parallel_selector.fit(data, label)
+        self.assertListAlmostEqual(list(selector.get_absolute_scores()), list(parallel_selector.get_absolute_scores()))
+
+        # Sparse data with linear method
+        sparse_selector = Selective(SelectionMethod.Stability(method, num_subsamples=10))
+        sparse_selector.fit(sparse.csr_matrix(data.values), label)
+        self.assertListAlmostEqual(list(selector.get_absolute_scores()), list(sparse_selector.get_absolute_scores()))
+
+    def test_stability_tree(self):
+        data, label = get_data_label(load_iris())
+
+        estimator = ExtraTreesClassifier(n_estimators=10, random_state=123)
+        method = SelectionMethod.Stability(SelectionMethod.TreeBased(num_features=2, estimator=estimator),
+                                           num_subsamples=5)
+        selector = Selective(method)
+        subset = selector.fit_transform(data, label)
+
+        self.assertEqual(subset.shape, (150, 2))
+        self.assertAlmostEqual(selector.get_absolute_scores().sum(), 2)
+
+    def test_stability_invalid(self):
+        with self.assertRaises(TypeError):
+            Selective(SelectionMethod.Stability(SelectionMethod.Variance()))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Stability(SelectionMethod.Linear(num_features=2), num_subsamples=0))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Stability(SelectionMethod.Linear(num_features=2), n_jobs=0))
+
+        # Num features of the method cannot exceed the number of features
+        data, label = get_data_label(load_iris())
+        selector = Selective(SelectionMethod.Stability(SelectionMethod.Linear(num_features=5)))
+        with self.assertRaises(ValueError):
+            selector.fit(data, label)
+
+        # Tree-based methods do not take sparse data
+        selector = Selective(SelectionMethod.Stability(SelectionMethod.TreeBased(num_features=2)))
+        with self.assertRaises(ValueError):
+            selector.fit(sparse.csr_matrix(data.values), label)
@@ -2,7 +2,13 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
 from sklearn.datasets import load_boston, load_iris
+from sklearn.feature_selection import chi2, f_classif, f_regression
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -111,3 +117,156 @@ class TestANOVA(BaseTest):
         self.assertEqual(subset.shape[1], 4)
         self.assertListEqual(list(subset.columns),
                              ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_anova_partial_fit(self):
+        for loader, score_func in [(load_boston, f_regression), (load_iris, f_classif)]:
+            data, label = get_data_label(loader())
+            data["CONSTANT"] = 1.0
+            expected = score_func(data, label)[0]
+
+            # Rows are sorted by class in iris, chunks have different classes
+            selector = Selective(SelectionMethod.Statistical(num_features=3, method="anova"))
+            for start in range(0, len(data), 40):
+                selector.partial_fit(data.iloc[start:start + 40], label.iloc[start:start + 40])
+            subset = selector.transform(data)
+
+            self.assertListAlmostEqual(np.nan_to_num(selector.get_absolute_scores()), np.nan_to_num(expected))
+            self.assertListEqual(list(subset.columns), list(data.columns[sorted(np.argsort(expected)[-3:])]))
+
+    def test_anova_merge(self):
+        data, label = get_data_label(load_iris())
+
+        # Shards fit in separate processes are pickled back and merged
+        shards = [Selective(SelectionMethod.Statistical(num_features=2, method="anova")) for _ in range(3)]
+        for shard, index in zip(shards, np.array_split(np.random.default_rng(5).permutation(len(data)), 3)):
+            shard.partial_fit(data.iloc[index], label.iloc[index])
+        selector = pickle.loads(pickle.dumps(shards[0]))
+        for shard in shards[1:]:
+            selector.merge(pickle.loads(pickle.dumps(shard)))
+        subset = selector.transform(data)
+
+        self.assertListAlmostEqual(selector.get_absolute_scores(), f_classif(data, label)[0])
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_anova_partial_fit_invalid(self):
+        data, label = get_data_label(load_iris())
+
+        selector = Selective(SelectionMethod.Statistical(num_features=2, method="mutual_info"))
+        with self.assertRaises(ValueError):
+            selector.partial_fit(data, label)
+
+        selector = Selective(SelectionMethod.Statistical(num_features=2, method="anova"))
+        selector.partial_fit(data, label)
+        with self.assertRaises(ValueError):
+            selector.partial_fit(data.iloc[:, :3], label)
+
+        # Chunks with missing or infinite values are rejected, as in fit, and the statistics are not updated
+        selector = Selective(SelectionMethod.Statistical(num_features=2, method="anova"))
+        selector.partial_fit(data.iloc[:75], label.iloc[:75])
+        missing = data.iloc[75:].copy()
+        missing.iloc[0, 0] = np.nan
+        with self.assertRaises(ValueError):
+            selector.partial_fit(missing, label.iloc[75:])
+        infinite = data.iloc[75:].copy()
+        infinite.iloc[0, 0] = np.inf
+        with self.assertRaises(ValueError):
+            selector.partial_fit(infinite, label.iloc[75:])
+        with self.assertRaises(ValueError):
+            selector.partial_fit(data.iloc[75:], label.iloc[75:].replace(1, np.nan))
+        selector.partial_fit(data.iloc[75:], label.iloc[75:])
+        self.assertListAlmostEqual(selector.get_absolute_scores(), f_classif(data, label)[0])
+
+    def test_anova_multi_target(self):
+        data, label = get_data_label(load_boston())
+        rng = np.random.default_rng(8)
+        labels = pd.DataFrame({"price": label, "noisy": label + rng.standard_normal(len(label)),
+                               "expensive": (label > label.median()).astype(int),
+                               "decile": pd.qcut(label, 10, labels=False)})
+
+        method = SelectionMethod.Statistical(num_features=3, method="anova")
+        selector = Selective(method)
+        subsets = selector.fit_transform(data, labels)
+        scores = selector.get_absolute_scores()
+
+        # Same scores and top-k as each target on its own
+        self.assertListEqual(list(scores.index), list(labels.columns))
+        self.assertListEqual(list(scores.columns), list(data.columns))
+        for target in labels.columns:
+            expected = Selective(method)
+            expected_subset = expected.fit_transform(data, labels[target])
+            self.assertListAlmostEqual(scores.loc[target], expected.get_absolute_scores())
+            self.assertListEqual(list(subsets[target].columns), list(expected_subset.columns))
+
+        # Sparse features and classification targets with chi-square
+        matrix = sparse.csr_matrix(data.values)
+        selector = Selective(SelectionMethod.Statistical(num_features=3, method="chi_square"))
+        subsets = selector.fit_transform(matrix, labels[["expensive", "decile"]])
+        for target in ["expensive", "decile"]:
+            self.assertListAlmostEqual(selector.get_absolute_scores().loc[target], chi2(data, labels[target])[0])
+            self.assertEqual(subsets[target].shape[1], 3)
+
+    def test_anova_multi_target_invalid(self):
+        data, label = get_data_label(load_boston())
+        labels = pd.DataFrame({"price": label, "expensive": (label > label.median()).astype(int)})
+
+        # Chi-square cannot score regression targets
+        with self.assertRaises(TypeError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="chi_square")).fit(data, labels)
+
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info")).fit(data, labels)
+
+        # Chi-square needs non-negative features, as with a single target
+        negative = data - data.mean()
+        method = SelectionMethod.Statistical(num_features=3, method="chi_square")
+        with self.assertRaises(ValueError):
+            Selective(method).fit(negative, labels[["expensive"]])
+        with self.assertRaises(ValueError):
+            Selective(method).fit(sparse.csr_matrix(negative.values), labels[["expensive"]])
+
+        # Missing features and missing labels are rejected, as with a single target
+        missing = data.copy()
+        missing.iloc[0, 0] = np.nan
+        method = SelectionMethod.Statistical(num_features=3, method="anova")
+        with self.assertRaises(ValueError):
+            Selective(method).fit(missing, labels)
+        with self.assertRaises(ValueError):
+            Selective(method).fit(missing, label)
+        missing = labels.astype(float)
+        missing.iloc[0, 1] = np.nan
+        with self.assertRaises(ValueError):
+            Selective(method).fit(data, missing)
+        with self.assertRaises(ValueError):
+            Selective(method).fit(data, missing["expensive"])
+
+    def test_anova_p_values(self):
+        data, label = get_data_label(load_iris())
+        data["NOISE"] = np.random.default_rng(2).standard_normal(len(data))
+
+        method = SelectionMethod.Statistical(num_features=2, method="anova", num_permutations=200)
+        selector = Selective(method)
+        selector.fit(data, label)
+        p_values = selector.get_p_values()
+
+        # Informative features are never exceeded by permuted scores, noise is not significant
+        self.assertListAlmostEqual(p_values[:4], [1 / 201] * 4)
+        self.assertGreater(p_values[4], 0.05)
+
+        # No p-values without permutations
+        selector = Selective(SelectionMethod.Statistical(num_features=2, method="anova"))
+        selector.fit(data, label)
+        self.assertIsNone(selector.get_p_values())
+
+        # Regression and multiple targets
+        data, label = get_data_label(load_boston())
+        labels = pd.DataFrame({"price": label, "expensive": (label > label.median()).astype(int)})
+        selector = Selective(SelectionMethod.Statistical(num_features=3, method="anova", num_permutations=50))
+        selector.fit(data, labels)
+        self.assertEqual(selector.get_p_values().shape, (2, data.shape[1]))
+        self.assertAlmostEqual(selector.get_p_values().loc["price", "LSTAT"], 1 / 51)
+
+    def test_anova_p_values_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info", num_permutations=100))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="anova", num_permutations=0))
@@ -2,7 +2,10 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import numpy as np
+from scipy import sparse
 from sklearn.datasets import load_boston, load_iris
+from sklearn.feature_selection import chi2
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -77,3 +80,42 @@ class TestChi(BaseTest):
         self.assertEqual(subset.shape[1], 4)
         self.assertListEqual(list(subset.columns),
                              ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_chi_classif_sparse(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=2, method="chi_square")
+        expected = Selective(method)
+        expected_subset = expected.fit_transform(data, label)
+
+        selector = Selective(method)
+        subset = selector.fit_transform(sparse.csr_matrix(data.values), label)
+
+        self.assertTrue(sparse.issparse(subset))
+        self.assertListAlmostEqual(selector.get_absolute_scores(), expected.get_absolute_scores())
+        self.assertTrue(np.allclose(subset.toarray(), expected_subset.values))
+
+    def test_chi_sparse_unsupported(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=2, method="mutual_info")
+        with self.assertRaises(ValueError):
+            Selective(method).fit(sparse.csr_matrix(data.values), label)
+
+    def test_chi_classif_partial_fit(self):
+        data, label = get_data_label(load_iris())
+        data = data.mask(data < data.median(), 0)
+        matrix = sparse.csr_matrix(data.values)
+
+        # Sparse chunks of rows, merged across two shards
+        selectors = [Selective(SelectionMethod.Statistical(num_features=2, method="chi_square")) for _ in range(2)]
+        for start in range(0, len(data), 25):
+            selectors[start // 25 % 2].partial_fit(matrix[start:start + 25], label.iloc[start:start + 25])
+        selectors[0].merge(selectors[1])
+        subset = selectors[0].transform(matrix)
+
+        self.assertListAlmostEqual(selectors[0].get_absolute_scores(), chi2(data, label)[0])
+        self.assertEqual(subset.shape[1], 2)
+
+        with self.assertRaises(ValueError):
+            selectors[0].partial_fit(-matrix[:25], label.iloc[:25])
@@ -2,115 +2,140 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-# from sklearn.datasets import load_boston, load_iris
-# from feature.utils import get_data_label
-# from feature.selector import Selective, SelectionMethod
+import numpy as np
+import pandas as pd
+from sklearn.datasets import load_boston, load_iris
+from feature.utils import get_data_label
+from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
 
 
 class TestMaximalInfo(BaseTest):
 
-    def test_maximal(self):
-        pass
-
-    # def test_maximal_regress_top_k(self):
-    #     data, label = get_data_label(load_boston())
-    #     data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
-    #
-    #     method = SelectionMethod.Statistical(num_features=3, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 3)
-    #     self.assertListEqual(list(subset.columns), ['CRIM', 'AGE', 'LSTAT'])
-    #
-    # def test_maximal_regress_top_percentile(self):
-    #     data, label = get_data_label(load_boston())
-    #     data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
-    #
-    #     method = SelectionMethod.Statistical(num_features=0.6, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 3)
-    #     self.assertListEqual(list(subset.columns), ['CRIM', 'AGE', 'LSTAT'])
-    #
-    # def test_maximal_regress_top_k_all(self):
-    #     data, label = get_data_label(load_boston())
-    #     data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
-    #
-    #     method = SelectionMethod.Statistical(num_features=5, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(data.shape[1], subset.shape[1])
-    #     self.assertListEqual(list(data.columns), list(subset.columns))
-    #
-    # def test_maximal_regress_top_percentile_all(self):
-    #     data, label = get_data_label(load_boston())
-    #     data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
-    #
-    #     method = SelectionMethod.Statistical(num_features=1.0, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(data.shape[1], subset.shape[1])
-    #     self.assertListEqual(list(data.columns), list(subset.columns))
-    #
-    # def test_maximal_classif_top_k(self):
-    #     data, label = get_data_label(load_iris())
-    #
-    #     method = SelectionMethod.Statistical(num_features=2, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 2)
-    #     self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
-    #
-    # def test_maximal_classif_top_percentile(self):
-    #     data, label = get_data_label(load_iris())
-    #
-    #     method = SelectionMethod.Statistical(num_features=0.5, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 2)
-    #     self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
-    #
-    # def test_maximal_classif_top_percentile_all(self):
-    #     data, label = get_data_label(load_iris())
-    #
-    #     method = SelectionMethod.Statistical(num_features=1.0, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 4)
-    #     self.assertListEqual(list(subset.columns),
-    #                          ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
-    #
-    # def test_maximal_classif_top_k_all(self):
-    #     data, label = get_data_label(load_iris())
-    #
-    #     method = SelectionMethod.Statistical(num_features=4, method="maximal_info")
-    #     selector = Selective(method)
-    #     selector.fit(data, label)
-    #     subset = selector.transform(data)
-    #
-    #     # Reduced columns
-    #     self.assertEqual(subset.shape[1], 4)
-    #     self.assertListEqual(list(subset.columns),
-    #                          ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+    def test_maximal_regress_top_k(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Statistical(num_features=3, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 3)
+        self.assertListEqual(list(subset.columns), ['CRIM', 'AGE', 'LSTAT'])
+
+    def test_maximal_regress_top_percentile(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Statistical(num_features=0.6, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 3)
+        self.assertListEqual(list(subset.columns), ['CRIM', 'AGE', 'LSTAT'])
+
+    def test_maximal_regress_top_k_all(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Statistical(num_features=5, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(data.shape[1], subset.shape[1])
+        self.assertListEqual(list(data.columns), list(subset.columns))
+
+    def test_maximal_regress_top_percentile_all(self):
+        data, label = get_data_label(load_boston())
+        data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
+
+        method = SelectionMethod.Statistical(num_features=1.0, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(data.shape[1], subset.shape[1])
+        self.assertListEqual(list(data.columns), list(subset.columns))
+
+    def test_maximal_classif_top_k(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=2, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 2)
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_maximal_classif_top_percentile(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=0.5, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 2)
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_maximal_classif_top_percentile_all(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=1.0, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 4)
+        self.assertListEqual(list(subset.columns),
+                             ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_maximal_classif_top_k_all(self):
+        data, label = get_data_label(load_iris())
+
+        method = SelectionMethod.Statistical(num_features=4, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertEqual(subset.shape[1], 4)
+        self.assertListEqual(list(subset.columns),
+                             ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_maximal_classif_relabel(self):
+        data, label = get_data_label(load_iris())
+
+        # Classes have no order, relabeling the classes leaves the scores unchanged
+        method = SelectionMethod.Statistical(num_features=2, method="maximal_info")
+        selector = Selective(method)
+        selector.fit(data, label)
+        relabeled_selector = Selective(method)
+        relabeled_selector.fit(data, label.map({0: 2, 1: 0, 2: 1}))
+        self.assertTrue(np.allclose(selector.get_absolute_scores(), relabeled_selector.get_absolute_scores()))
+
+    def test_maximal_functional(self):
+        rng = np.random.default_rng(6)
+        x = rng.uniform(-1, 1, 2000)
+        data = pd.DataFrame({"x": x, "noise": rng.uniform(-1, 1, len(x))})
+
+        # Noiseless functions have MIC close to 1, independent features close to 0
+        for label in [x, x ** 2, np.exp(x)]:
+            for n_jobs in [1, 2]:
+                method = SelectionMethod.Statistical(num_features=1, method="maximal_info", n_jobs=n_jobs)
+                selector = Selective(method)
+                selector.fit(data, pd.Series(label))
+                self.assertGreater(selector.get_absolute_scores()[0], 0.95)
+                self.assertLess(selector.get_absolute_scores()[1], 0.05)
+
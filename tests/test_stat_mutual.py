@@ -2,7 +2,10 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import numpy as np
+import pandas as pd
 from sklearn.datasets import load_boston, load_iris
+from sklearn.feature_selection import mutual_info_classif, mutual_info_regression
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -111,3 +114,56 @@ class TestMutualInfo(BaseTest):
         self.assertEqual(subset.shape[1], 4)
         self.assertListEqual(list(subset.columns),
                              ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_mutual_same_as_sklearn(self):
+        rng = np.random.default_rng(4)
+
+        for loader, score_func in [(load_boston, mutual_info_regression), (load_iris, mutual_info_classif)]:
+            data, label = get_data_label(loader())
+            data["TIES"] = rng.integers(0, 3, len(data))
+            expected = score_func(data, label, random_state=7)
+
+            # Same scores regardless of the number of jobs
+            for n_jobs in [1, 2, -1]:
+                method = SelectionMethod.Statistical(num_features=3, method="mutual_info", n_jobs=n_jobs)
+                selector = Selective(method, seed=7)
+                selector.fit(data, label)
+                self.assertTrue(np.array_equal(selector.get_absolute_scores(), expected))
+
+    def test_mutual_invalid_jobs(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info", n_jobs=0))
+
+    def test_mutual_binned(self):
+        rng = np.random.default_rng(11)
+        data = pd.DataFrame(rng.standard_normal((20000, 6)), columns=list("abcdef"))
+        label = pd.Series(np.sin(3 * data["a"]) + data["b"] ** 2 + 0.5 * data["c"]
+                          + 0.1 * rng.standard_normal(len(data)))
+
+        # Nonlinear dependencies are ranked as in the knn estimator
+        for binning in ["quantile", "uniform"]:
+            method = SelectionMethod.Statistical(num_features=3, method="mutual_info",
+                                                 estimator="binned", binning=binning, n_jobs=2)
+            selector = Selective(method)
+            subset = selector.fit_transform(data, label)
+            self.assertListEqual(sorted(subset.columns), ["a", "b", "c"])
+            self.assertListAlmostEqual(list(selector.get_absolute_scores()[3:]), [0, 0, 0])
+
+        # Classes are used as is
+        data, label = get_data_label(load_iris())
+        method = SelectionMethod.Statistical(num_features=2, method="mutual_info", estimator="binned", num_bins=8)
+        selector = Selective(method)
+        subset = selector.fit_transform(data, label)
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_mutual_binned_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info", estimator="kde"))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="anova", estimator="binned"))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info", estimator="binned",
+                                                  num_bins=1))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="mutual_info", estimator="binned",
+                                                  binning="kmeans"))
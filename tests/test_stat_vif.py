@@ -2,8 +2,10 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
-
+import numpy as np
+import pandas as pd
 from sklearn.datasets import load_boston, load_iris
+from statsmodels.stats.outliers_influence import variance_inflation_factor
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -85,3 +87,71 @@ class TestVIF(BaseTest):
         self.assertEqual(subset.shape[1], 4)
         self.assertListEqual(list(subset.columns),
                              ['sepal length (cm)', 'sepal width (cm)', 'petal length (cm)', 'petal width (cm)'])
+
+    def test_vif_closed_form(self):
+        data, label = get_data_label(load_boston())
+        rng = np.random.default_rng(1)
+        data["CONSTANT"] = 1.0
+        data["NOISE"] = rng.normal(size=len(data))
+
+        method = SelectionMethod.Statistical(num_features=5, method="variance_inflation")
+        selector = Selective(method)
+        selector.fit(data)
+
+        # Same as one regression per feature, including centered R^2 when a constant is present
+        expected = [variance_inflation_factor(data.values, i) for i in range(data.shape[1])]
+        self.assertTrue(np.allclose(selector.get_absolute_scores(), expected, rtol=1e-8))
+
+    def test_vif_singular(self):
+        data, label = get_data_label(load_iris())
+        data["sum"] = data.iloc[:, 0] + data.iloc[:, 1]
+
+        method = SelectionMethod.Statistical(num_features=2, method="variance_inflation")
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+
+        # Collinear features have infinite VIF, the others are found with the pseudo-inverse
+        scores = selector.get_absolute_scores()
+        self.assertListEqual(list(np.isinf(scores)), [True, True, False, False, True])
+        expected = [variance_inflation_factor(data.values, i) for i in [2, 3]]
+        self.assertListAlmostEqual(list(scores[2:4]), expected)
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_vif_stepwise(self):
+        data, label = get_data_label(load_boston())
+
+        method = SelectionMethod.Statistical(num_features=2, method="variance_inflation", vif_threshold=5)
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+
+        # Same as dropping the largest VIF and fitting again until all are below threshold
+        remaining = data.copy()
+        expected_order = []
+        while True:
+            vif = pd.Series([variance_inflation_factor(remaining.values, i) for i in range(remaining.shape[1])],
+                            index=remaining.columns)
+            if vif.max() < 5:
+                break
+            expected_order.append(vif.idxmax())
+            remaining = remaining.drop(columns=[vif.idxmax()])
+
+        diagnostics = selector.get_diagnostics()
+        self.assertListEqual(diagnostics["elimination_order"], expected_order)
+        self.assertListEqual(list(subset.columns), list(remaining.columns))
+        self.assertListAlmostEqual(list(selector.get_absolute_scores()[data.columns.get_indexer(remaining.columns)]),
+                                   list(vif.values))
+        self.assertLess(diagnostics["vif_trace"][-1], 5)
+
+    def test_vif_stepwise_min_features(self):
+        data, label = get_data_label(load_iris())
+        data["sum"] = data.iloc[:, 0] + data.iloc[:, 1]
+
+        # Collinear feature is eliminated first, elimination stops at num_features
+        method = SelectionMethod.Statistical(num_features=3, method="variance_inflation", vif_threshold=1.0)
+        selector = Selective(method)
+        subset = selector.fit_transform(data)
+        self.assertEqual(selector.get_diagnostics()["elimination_order"][0], "sum")
+        self.assertEqual(subset.shape[1], 3)
+
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Statistical(num_features=3, method="anova", vif_threshold=5))
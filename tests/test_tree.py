@@ -12,6 +12,7 @@ from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegress
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from xgboost import XGBClassifier, XGBRegressor
 
+from feature import tree_based
 from feature.selector import Selective, SelectionMethod
 from feature.utils import get_data_label, Constants
 from tests.test_base import BaseTest
@@ -307,7 +308,8 @@ class TestTree(BaseTest):
         data, label = get_data_label(load_boston())
         data = data.drop(columns=["CHAS", "NOX", "RM", "DIS", "RAD", "TAX", "PTRATIO", "INDUS"])
 
-        method = SelectionMethod.TreeBased(num_features=3, estimator=CatBoostRegressor(silent=True, random_state=Constants.default_seed))
+        estimator = CatBoostRegressor(silent=True, allow_writing_files=False, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=3, estimator=estimator)
         selector = Selective(method)
         selector.fit(data, label)
         subset = selector.transform(data)
@@ -319,7 +321,8 @@ class TestTree(BaseTest):
     def test_tree_estimator_catboost_classif_top_k(self):
         data, label = get_data_label(load_iris())
 
-        method = SelectionMethod.TreeBased(num_features=2, estimator=CatBoostClassifier(silent=True, random_state=Constants.default_seed))
+        estimator = CatBoostClassifier(silent=True, allow_writing_files=False, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=2, estimator=estimator)
         selector = Selective(method)
         selector.fit(data, label)
         subset = selector.transform(data)
@@ -327,3 +330,95 @@ class TestTree(BaseTest):
         # Reduced columns
         self.assertEqual(subset.shape[1], 2)
         self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+    def test_tree_batch_size(self):
+        data, label = get_data_label(load_iris())
+
+        estimator = RandomForestClassifier(n_estimators=200, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=2, estimator=estimator, batch_size=10)
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+        # Stops before all trees, the given estimator is not modified
+        diagnostics = selector.get_diagnostics()
+        self.assertTrue(diagnostics["converged"])
+        self.assertLess(diagnostics["num_estimators"][-1], 200)
+        self.assertEqual(len(selector._imp.imp.estimators_), diagnostics["num_estimators"][-1])
+        self.assertEqual(estimator.n_estimators, 200)
+        self.assertFalse(estimator.warm_start)
+
+    def test_tree_batch_size_all_trees(self):
+        data, label = get_data_label(load_boston())
+
+        # Batches up to the number of trees, the last batch is smaller
+        estimator = GradientBoostingRegressor(n_estimators=25, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=3, estimator=estimator, batch_size=10)
+        selector = Selective(method)
+        selector.fit(data, label)
+
+        diagnostics = selector.get_diagnostics()
+        self.assertListEqual(diagnostics["num_estimators"], [10, 20, 25])
+        self.assertEqual(len(diagnostics["rank_correlations"]), len(diagnostics["num_estimators"]) - 1)
+
+    def test_tree_batch_size_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.TreeBased(num_features=2, batch_size=0))
+        with self.assertRaises(TypeError):
+            Selective(SelectionMethod.TreeBased(num_features=2, batch_size=1.5))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.TreeBased(num_features=2, estimator=LGBMClassifier(), batch_size=10))
+
+    def test_tree_permutation_importance(self):
+        data, label = get_data_label(load_iris())
+
+        estimator = RandomForestClassifier(n_estimators=20, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=2, estimator=estimator, importance="permutation")
+        selector = Selective(method)
+        selector.fit(data, label)
+        subset = selector.transform(data)
+
+        # Reduced columns
+        self.assertListEqual(list(subset.columns), ['petal length (cm)', 'petal width (cm)'])
+
+        # Decrease of accuracy from the baseline
+        diagnostics = selector.get_diagnostics()
+        self.assertAlmostEqual(diagnostics["baseline_score"], 1, delta=0.01)
+        self.assertEqual(len(diagnostics["importances_std"]), 4)
+
+    def test_tree_permutation_importance_batches(self):
+        data, label = get_data_label(load_boston())
+
+        estimator = ExtraTreesRegressor(n_estimators=10, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=3, estimator=estimator, importance="permutation")
+        selector = Selective(method)
+        selector.fit(data, label)
+
+        # Same importances with a single block in each prediction and parallel jobs
+        buffer_size = tree_based._BUFFER_SIZE
+        tree_based._BUFFER_SIZE = 1
+        try:
+            parallel_selector = Selective(method._replace(n_jobs=2))
+            parallel_selector.fit(data, label)
+        finally:
+            tree_based._BUFFER_SIZE = buffer_size
+        self.assertListAlmostEqual(list(selector.get_absolute_scores()), list(parallel_selector.get_absolute_scores()))
+
+    def test_tree_permutation_importance_boosting(self):
+        data, label = get_data_label(load_boston())
+
+        # Baseline is the score of the fitted model on the training data, without rounding to float32
+        estimator = LGBMRegressor(n_estimators=20, random_state=Constants.default_seed)
+        method = SelectionMethod.TreeBased(num_features=3, estimator=estimator, importance="permutation")
+        selector = Selective(method)
+        selector.fit(data, label)
+        self.assertAlmostEqual(selector.get_diagnostics()["baseline_score"], estimator.score(data, label))
+
+    def test_tree_permutation_importance_invalid(self):
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.TreeBased(num_features=2, importance="gain"))
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.TreeBased(num_features=2, n_jobs=0))
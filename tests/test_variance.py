@@ -2,8 +2,12 @@
 # Copyright FMR LLC <opensource@fidelity.com>
 # SPDX-License-Identifier: GNU GPLv3
 
+import pickle
 
+import numpy as np
+from scipy import sparse
 from sklearn.datasets import load_boston
+from sklearn.feature_selection import VarianceThreshold
 from feature.utils import get_data_label
 from feature.selector import Selective, SelectionMethod
 from tests.test_base import BaseTest
@@ -84,3 +88,64 @@ class TestVariance(BaseTest):
         self.assertEqual(subset.shape[1], 10)
         self.assertListEqual(list(subset.columns),
                              ['CRIM', 'ZN', 'INDUS', 'AGE', 'DIS', 'RAD', 'TAX', 'PTRATIO', 'B', 'LSTAT'])
+
+    def test_variance_partial_fit(self):
+        data, label = get_data_label(load_boston())
+        data = data.mask(np.random.default_rng(3).random(data.shape) < 0.1)
+
+        for threshold in [0, 1.0]:
+            expected = VarianceThreshold(threshold).fit(data).variances_
+
+            selector = Selective(SelectionMethod.Variance(threshold=threshold))
+            for start in range(0, len(data), 100):
+                selector.partial_fit(data.iloc[start:start + 100])
+            subset = selector.transform(data)
+
+            self.assertListAlmostEqual(selector.get_absolute_scores(), expected)
+            self.assertListEqual(list(subset.columns), list(data.columns[expected > threshold]))
+
+    def test_variance_merge(self):
+        data, label = get_data_label(load_boston())
+        data["CONSTANT"] = 1e9
+
+        # Shards fit in separate processes are pickled back and merged
+        shards = [Selective(SelectionMethod.Variance()) for _ in range(3)]
+        for shard, index in zip(shards, np.array_split(np.arange(len(data)), 3)):
+            shard.partial_fit(data.iloc[index])
+        selector = pickle.loads(pickle.dumps(shards[0]))
+        for shard in shards[1:]:
+            selector.merge(pickle.loads(pickle.dumps(shard)))
+        subset = selector.transform(data)
+
+        self.assertListAlmostEqual(selector.get_absolute_scores(), VarianceThreshold().fit(data).variances_)
+        self.assertListEqual(list(subset.columns), list(data.columns[:-1]))
+
+        other = Selective(SelectionMethod.Variance(threshold=1.0))
+        other.fit(data)
+        with self.assertRaises(ValueError):
+            selector.merge(other)
+
+    def test_variance_drop_all_raises(self):
+        data, label = get_data_label(load_boston())
+
+        with self.assertRaises(ValueError):
+            Selective(SelectionMethod.Variance(threshold=100000)).fit(data)
+
+    def test_variance_sparse(self):
+        data, label = get_data_label(load_boston())
+        data = data.mask(data < data.median())
+        data["CONSTANT"] = 0.0
+        data = data.fillna(0)
+        matrix = sparse.csc_matrix(data.values)
+
+        for threshold in [0, 1.0]:
+            expected = Selective(SelectionMethod.Variance(threshold=threshold))
+            expected_subset = expected.fit_transform(data)
+
+            selector = Selective(SelectionMethod.Variance(threshold=threshold))
+            subset = selector.fit_transform(matrix)
+
+            # Sliced sparse matrix of the same columns
+            self.assertTrue(sparse.issparse(subset))
+            self.assertListAlmostEqual(selector.get_absolute_scores(), expected.get_absolute_scores())
+            self.assertTrue(np.array_equal(subset.toarray(), expected_subset.values))